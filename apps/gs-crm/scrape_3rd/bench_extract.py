@@ -0,0 +1,184 @@
+# bench_extract.py
+# Purpose: benchmark suite for the extractor on saved fixture pages and synthetic multi-MB Zillow
+# pages (pages/s and peak traced memory per extraction function), a regression gate against a saved
+# baseline, plus a golden check that row_from_html still produces fixtures/golden_rows.csv.
+#
+#   python bench_extract.py --sizes 1 4 8 --repeat 3 --save-baseline   # on a known-good tree
+#   python bench_extract.py --sizes 1 4 8 --repeat 3                   # fails on a >25% regression
+#
+# Baselines are machine-specific: save and compare on the same box.
+
+import csv, json, time, random, pathlib, argparse, tracemalloc
+from urllib.parse import urlsplit
+from typing import Any, Callable, Dict, List
+
+import compile_listings
+from compile_listings import (FIELDNAMES, FieldTimer, ParsedPage, row_from_html, site_specific_extract,
+                              extract_json_ld, extract_coords, extract_images, parse_common_stats,
+                              snapshot_url, listing_key)
+
+HERE = pathlib.Path(__file__).parent
+FIXTURES_DIR = HERE / "fixtures"
+GOLDEN_CSV = FIXTURES_DIR / "golden_rows.csv"
+BASELINE_JSON = HERE / "bench_baseline.json"
+THRESHOLD = 0.25      # allowed slowdown (or memory growth) vs. the baseline, as a fraction
+MEMORY_SLACK_MB = 1.0  # peaks this close to the baseline are noise, not regressions
+
+def fixture_pages() -> List[Dict[str, str]]:
+    """Saved pages with a listing URL for each, as --from-snapshots derives it (snapshot_url)."""
+    pages = []
+    for f in sorted(FIXTURES_DIR.glob("*.html")):
+        html = f.read_text(encoding="utf-8")
+        pages.append({"url": snapshot_url(f, html), "html": html, "name": f.name})
+    return pages
+
+def synthetic_zillow_page(base_html: str, megabytes: float, seed: int = 7) -> str:
+    """Inflate a fixture to Zillow size: a large __NEXT_DATA__ JSON blob plus lots of markup.
+    The filler avoids every field phrase and listing-photo URL, so extraction must match the base page."""
+    rnd = random.Random(seed)
+    homes, size = [], 0
+    while size < megabytes * 0.6e6:
+        hid = rnd.getrandbits(128)
+        home = json.dumps({
+            "id": rnd.randrange(10**7, 10**8),
+            "photos": [f"https://photos.zillowstatic.com/p_e/{hid:032x}-cc_ft_{w}.webp" for w in (384, 768, 1536)],
+            "blurb": "Bright kitchen near the park with mountain views and a shaded patio",
+        })
+        homes.append(home)
+        size += len(home)
+    blob = '{"props": {"pageProps": {"nearby": [' + ", ".join(homes) + "]}}}"
+    rows, size, i = [], 0, 0
+    while size < megabytes * 0.4e6:
+        rows.append(f'<div class="c{i % 50}"><span data-k="{i}">Nearby {i}</span><a href="/n/{i}/">view</a></div>\n')
+        size += len(rows[-1])
+        i += 1
+    filler = f'<script id="__NEXT_DATA__" type="application/json">{blob}</script>\n' + "".join(rows)
+    return base_html.replace("</body>", filler + "</body>")
+
+def check_golden() -> bool:
+    with GOLDEN_CSV.open(newline="", encoding="utf-8") as f:
+        # Golden rows carry the live URLs they were captured from; match them by listing.
+        golden = {listing_key(r["url"]): r for r in csv.DictReader(f)}
+    ok = True
+    for p in fixture_pages():
+        row = row_from_html(p["url"], p["html"])
+        got = {k: "" if row.get(k) is None else str(row.get(k, "")) for k in FIELDNAMES}
+        want = golden[listing_key(p["url"])]
+        for k in FIELDNAMES:
+            if k != "url" and got[k] != want[k]:
+                ok = False
+                print(f"  MISMATCH {p['name']} {k}: {want[k]!r} -> {got[k]!r}")
+    print(f"golden check: {'ok' if ok else 'FAILED'} ({GOLDEN_CSV.name})")
+    return ok
+
+# ----------------------------
+# SUITE
+# ----------------------------
+def extractor_cases(url: str, html: str) -> Dict[str, Callable[[], Any]]:
+    """One call per extraction entry point, each doing the work it does inside row_from_html."""
+    domain = urlsplit(url).hostname or ""
+    text = ParsedPage(html).text  # parse_common_stats takes text; time it without the parse
+    return {
+        "ParsedPage": lambda: ParsedPage(html),
+        "extract_json_ld": lambda: extract_json_ld(html),
+        "extract_coords": lambda: extract_coords(html),
+        "parse_common_stats": lambda: parse_common_stats(text),
+        "extract_images": lambda: extract_images(html, domain),
+        "site_specific_extract": lambda: site_specific_extract(domain, html, ParsedPage(html).text, None, url),
+        "row_from_html": lambda: row_from_html(url, html),
+    }
+
+def measure(pages: List[Dict[str, str]], repeat: int) -> Dict[str, Dict[str, float]]:
+    """Per function: best-of-repeat pages/s over the corpus and peak traced memory for one pass."""
+    cases = [extractor_cases(p["url"], p["html"]) for p in pages]
+    out = {}
+    for name in cases[0]:
+        calls = [c[name] for c in cases]
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            for call in calls:
+                call()
+            best = min(best, time.perf_counter() - t0)
+        tracemalloc.start()
+        for call in calls:
+            call()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        out[name] = {"pages_per_s": round(len(calls) / best, 2), "peak_mb": round(peak / 1e6, 3)}
+    return out
+
+def run_suite(pages: List[Dict[str, str]], sizes: List[float], repeat: int) -> Dict[str, Dict[str, Dict[str, float]]]:
+    corpora = {"fixtures": pages}
+    zillow = next(p for p in pages if "zillow.com" in p["url"])
+    for mb in sizes:
+        html = synthetic_zillow_page(zillow["html"], mb)
+        corpora[f"synthetic_{mb:g}mb"] = [dict(zillow, html=html, name=f"synthetic zillow {mb:g} MB")]
+    results = {}
+    for corpus, corpus_pages in corpora.items():
+        results[corpus] = measure(corpus_pages, repeat)
+        print(f"{corpus} ({len(corpus_pages)} pages, {sum(len(p['html']) for p in corpus_pages) / 1e6:.2f} MB)")
+        for name, r in results[corpus].items():
+            print(f"  {name:<24} {r['pages_per_s']:10.1f} pages/s  peak {r['peak_mb']:8.2f} MB")
+    return results
+
+def compare(results: Dict[str, Dict[str, Dict[str, float]]], baseline: Dict[str, Dict[str, Dict[str, float]]],
+            threshold: float) -> List[str]:
+    """Regressions vs. baseline (corpora/functions missing from either side are skipped)."""
+    problems = []
+    for corpus, funcs in results.items():
+        for name, r in funcs.items():
+            base = baseline.get(corpus, {}).get(name)
+            if base is None:
+                continue
+            if r["pages_per_s"] < base["pages_per_s"] * (1 - threshold):
+                problems.append(f"{corpus}/{name}: {r['pages_per_s']:.1f} pages/s vs baseline "
+                                f"{base['pages_per_s']:.1f} ({r['pages_per_s'] / base['pages_per_s'] - 1:+.0%})")
+            if r["peak_mb"] > base["peak_mb"] * (1 + threshold) + MEMORY_SLACK_MB:
+                problems.append(f"{corpus}/{name}: peak {r['peak_mb']:.2f} MB vs baseline {base['peak_mb']:.2f} MB")
+    return problems
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=float, nargs="*", default=[1, 4, 8], help="synthetic page sizes in MB")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--field-timing", action="store_true", help="report time per field (FIELD_TIMER hook)")
+    ap.add_argument("--baseline", type=pathlib.Path, default=BASELINE_JSON,
+                    help="results to compare against (default %(default)s)")
+    ap.add_argument("--save-baseline", action="store_true", help="write this run's results as the baseline")
+    ap.add_argument("--threshold", type=float, default=THRESHOLD,
+                    help="fail when pages/s drops (or peak memory grows) by more than this fraction")
+    ap.add_argument("--json", type=pathlib.Path, default=None, help="also write this run's results here")
+    args = ap.parse_args()
+    if args.field_timing:
+        compile_listings.FIELD_TIMER = FieldTimer()
+
+    ok = check_golden()
+    pages = fixture_pages()
+    zillow = next(p for p in pages if "zillow.com" in p["url"])
+    for mb in args.sizes:
+        big = synthetic_zillow_page(zillow["html"], mb)
+        if row_from_html(zillow["url"], big) != row_from_html(zillow["url"], zillow["html"]):
+            ok = False
+            print(f"  synthetic {mb} MB page extracted differently from its base page")
+    results = run_suite(pages, args.sizes, args.repeat)
+    if compile_listings.FIELD_TIMER is not None:
+        print(compile_listings.FIELD_TIMER.report())
+    if args.json is not None:
+        args.json.write_text(json.dumps(results, indent=1), encoding="utf-8")
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=1), encoding="utf-8")
+        print(f"baseline saved: {args.baseline}")
+    elif args.baseline.exists():
+        problems = compare(results, json.loads(args.baseline.read_text(encoding="utf-8")), args.threshold)
+        for p in problems:
+            print(f"  REGRESSION {p}")
+        print(f"regression check: {'FAILED' if problems else 'ok'} (threshold {args.threshold:.0%}, {args.baseline.name})")
+        ok = ok and not problems
+    else:
+        print(f"regression check: skipped (no {args.baseline.name}; run with --save-baseline first)")
+    if not ok:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# bench_fetch.py
+# Purpose: before/after timing of per-URL browser launch vs. the shared BrowserPool,
+# against the local fixture server (no network), plus the rate limiter against a fixture
+# server that answers 429 above --server-rate requests/s.
+#
+#   python bench_fetch.py --rounds 4 --pool-size 2 --concurrency 6
+
+import time, argparse
+
+import fixture_server
+import compile_listings
+from compile_listings import (BrowserPool, FetchOptions, ScrapeOptions, Pipeline, RateLimiter, fetch_page,
+                              build_rows, build_rows_async, summarize_render_waits, summarize_bytes)
+
+# Fixture pages all carry a JSON-LD block, so let the local host use readiness detection too.
+compile_listings.READY_SELECTORS["127.0.0.1"] = [compile_listings.JSON_LD_SELECTOR]
+
+def timed(label: str, fn, urls) -> float:
+    t0 = time.perf_counter()
+    for url in urls:
+        fn(url)
+    dt = time.perf_counter() - t0
+    print(f"{label:<28} {len(urls):>4} pages  {dt:7.2f}s  {dt / len(urls) * 1000:8.1f} ms/page")
+    return dt
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rounds", type=int, default=4, help="passes over the fixture URLs")
+    ap.add_argument("--pool-size", type=int, default=1)
+    ap.add_argument("--recycle-after", type=int, default=10)
+    ap.add_argument("--concurrency", type=int, default=6, help="pages in flight for the async engine")
+    ap.add_argument("--server-rate", type=float, default=5, help="listing requests/s the throttled server allows")
+    args = ap.parse_args()
+
+    httpd = fixture_server.serve()
+    urls = fixture_server.fixture_urls(httpd) * args.rounds
+    try:
+        before = timed("launch per URL (before)", fetch_page, urls)
+        with BrowserPool(size=args.pool_size, recycle_after=args.recycle_after) as pool:
+            after = timed("shared pool (after)", pool.fetch, urls)
+            print(summarize_render_waits(pool.stats))
+            full_stats = pool.stats
+        print(f"speedup: {before / after:.1f}x")
+
+        # Resource blocking: same pages, per-listing bytes saved vs. the unblocked pass above.
+        with BrowserPool(size=args.pool_size, recycle_after=args.recycle_after,
+                         opts=FetchOptions(block_resources=True)) as pool:
+            timed("shared pool + blocking", pool.fetch, urls)
+            blocked_stats = pool.stats
+        print(summarize_bytes(full_stats))
+        print(summarize_bytes(blocked_stats))
+        for full, blocked in list(zip(full_stats, blocked_stats))[:len(urls) // args.rounds]:
+            saved = full.get("bytes_loaded", 0) - blocked.get("bytes_loaded", 0)
+            print(f"  {blocked['url']:<60} saved {saved / 1e3:8.1f} kB, "
+                  f"{blocked.get('requests_blocked', 0)} requests blocked")
+
+        # Async engine vs. the sequential pool path: same rows, same order.
+        t0 = time.perf_counter()
+        with BrowserPool(size=args.pool_size, recycle_after=args.recycle_after) as pool:
+            seq_rows = build_rows(urls, pool)
+        seq = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        engine = ScrapeOptions(concurrency=args.concurrency, domain_limits={},
+                               pool_size=args.pool_size, recycle_after=args.recycle_after)
+        async_rows = build_rows_async(urls, engine)
+        par = time.perf_counter() - t0
+        print(f"build_rows sequential        {seq:7.2f}s")
+        print(f"build_rows_async (N={args.concurrency:<2})     {par:7.2f}s  ({seq / par:.1f}x)")
+        if async_rows != seq_rows:
+            raise SystemExit("async rows differ from sequential rows")
+        print("async rows identical to sequential rows")
+    finally:
+        httpd.shutdown()
+
+    # Rate limiting: without a limiter the throttled server 429s most of a concurrent run (those
+    # listings are skipped); a token bucket just under the server's rate gets every listing back.
+    handler = fixture_server.throttled_handler(args.server_rate)
+    httpd = fixture_server.serve(handler=handler)
+    urls = fixture_server.fixture_urls(httpd) * args.rounds
+    try:
+        for label, limiter in (("no limiter", None),
+                               ("token bucket", RateLimiter({"127.0.0.1": (args.server_rate * 0.9, 1)}))):
+            time.sleep(1)  # let the server's bucket refill between runs
+            served, rejected = handler.served, handler.rejected
+            t0 = time.perf_counter()
+            rows = build_rows_async(urls, engine, Pipeline(limiter=limiter))
+            dt = time.perf_counter() - t0
+            print(f"{label:<20} {len(rows):>4}/{len(urls)} rows  {dt:7.2f}s  {len(rows) / dt:6.1f} rows/s  "
+                  f"{handler.served - served} served, {handler.rejected - rejected} answered 429")
+            if limiter is not None:
+                print(limiter.summary())
+    finally:
+        httpd.shutdown()
+
+if __name__ == "__main__":
+    main()
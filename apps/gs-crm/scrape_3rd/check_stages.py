@@ -0,0 +1,161 @@
+# check_stages.py
+# Purpose: quick self-contained checks for the pipeline stages that the golden check in
+# bench_extract.py never reaches: RowWriter resume over a torn CSV tail, InputOrder's ordering and
+# buffer cap, TokenBucket backoff and recovery, PropertyIndex merging and (with pyarrow) Parquet
+# recovery after a crash. No browser or network needed.
+#
+#   python check_stages.py          # exits non-zero if any check fails
+
+import csv, sys, pathlib, tempfile, traceback
+from typing import Any, Callable, Dict, List
+
+import sinks
+from scrape_common import FIELDNAMES
+from rate_limit import TokenBucket, BACKOFF_MAX_S
+from sinks import RowWriter, InputOrder, checkpoint_path, load_checkpoint
+from property_merge import PropertyIndex
+
+HERE = pathlib.Path(__file__).parent
+GOLDEN_CSV = HERE / "fixtures" / "golden_rows.csv"
+
+def fake_row(n: int) -> Dict[str, Any]:
+    return {"site": "Redfin", "url": f"https://www.redfin.com/AZ/Tempe/home/{n}", "address": f"{n} Main St"}
+
+def csv_urls(path: pathlib.Path) -> List[str]:
+    with path.open(newline="", encoding="utf-8") as f:
+        return [r["url"] for r in csv.DictReader(f)]
+
+# ----------------------------
+# CHECKS
+# ----------------------------
+def check_row_writer_resume(tmp: pathlib.Path) -> None:
+    path = tmp / "listings.csv"
+    with RowWriter(path) as w:
+        for n in range(3):
+            w.write(fake_row(n))
+    # A crash mid-write: a torn row without its checkpoint line, plus a duplicate of row 1.
+    with path.open("a", encoding="utf-8") as f:
+        f.write(f'Redfin,{fake_row(1)["url"]},"1 Main St"\nRedfin,https://www.redfin.com/AZ/Tempe/ho')
+    with RowWriter(path, resume=True) as w:
+        assert w.kept == 3, w.kept
+        assert w.done == {fake_row(n)["url"] for n in range(3)}
+        w.write(fake_row(3))
+        w.skip(fake_row(4)["url"])
+    assert csv_urls(path) == [fake_row(n)["url"] for n in range(4)], csv_urls(path)
+    assert load_checkpoint(path) == {fake_row(n)["url"] for n in range(5)}
+    # Without --resume the old output and checkpoint are started over.
+    with RowWriter(path) as w:
+        assert w.kept == 0 and not w.done
+    assert csv_urls(path) == [] and checkpoint_path(path).read_text(encoding="utf-8") == ""
+
+def check_input_order(tmp: pathlib.Path) -> None:
+    urls = [fake_row(n)["url"] for n in range(6)]
+    out: List[str] = []
+    order = InputOrder(urls, lambda r: out.append(r["url"]))
+    for n in (2, 0, 3):
+        order.row(fake_row(n))
+    assert out == urls[:1], out
+    order.skip(urls[1])
+    order.row(fake_row(5))
+    order.row(fake_row(4))
+    assert out == [urls[n] for n in (0, 2, 3, 4, 5)], out
+    assert order.peak == 2 and order.out_of_order == 0 and not order.held
+
+    # A stuck listing holds back at most `limit` rows, then turns up out of order.
+    out.clear()
+    order = InputOrder(urls, lambda r: out.append(r["url"]), limit=2)
+    for n in (1, 2, 3):
+        order.row(fake_row(n))
+    assert out == urls[1:4], out
+    assert order.peak <= 2, order.peak
+    order.row(fake_row(0))
+    order.skip(urls[5])
+    order.row(fake_row(4))
+    assert out == [urls[n] for n in (1, 2, 3, 0, 4)], out
+    assert order.out_of_order == 1 and not order.held and not order.late
+
+def check_token_bucket(tmp: pathlib.Path) -> None:
+    limit = 10.0
+    bucket = TokenBucket(limit, 2)
+    first = bucket.penalize()
+    assert 0 < first <= BACKOFF_MAX_S
+    assert bucket.penalize() <= first and bucket.penalties == 1  # same pause: one penalty
+    for _ in range(7):
+        bucket.paused_until = 0.0  # the pause has run out
+        bucket.penalize()
+    assert bucket.penalties == 8 and bucket.failures == 8
+    assert bucket.rate == limit / 16 and bucket.ceiling == limit / 16, (bucket.rate, bucket.ceiling)
+    assert bucket.penalize(retry_after=5) > 0
+    bucket.paused_until = 0.0
+    assert 4.9 < bucket.penalize(retry_after=5) <= 5.0
+    # A run of successes wins back the configured rate, not just the lowered ceiling.
+    for _ in range(250):
+        bucket.reward()
+    assert bucket.failures == 0
+    assert bucket.ceiling == limit and bucket.rate == limit, (bucket.rate, bucket.ceiling)
+
+def check_property_index(tmp: pathlib.Path) -> None:
+    index = PropertyIndex()
+    base = {"city": "Tempe", "state": "AZ", "zip_code": "85282", "latitude": "33.3963", "longitude": "-111.9354"}
+    index.add(dict(base, site="Redfin", url="r/233", address="233 E Erie Dr, Tempe, AZ 85282"))
+    index.add(dict(base, site="Zillow", url="z/237", address="237 East Erie Drive, Tempe, AZ 85282"))
+    index.add(dict(base, site="Zillow", url="z/233", address="233 East Erie Drive, Tempe, AZ 85282",
+                   bedrooms="3"))
+    groups = [[r["url"] for r in g] for g in index.groups()]
+    assert groups == [["r/233", "z/233"], ["z/237"]], groups  # neighbours at one geo key stay apart
+    merged = list(index.merged_rows())
+    assert merged[0]["url"] == "r/233|z/233" and merged[0]["bedrooms"] == "3", merged[0]
+
+    with GOLDEN_CSV.open(newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    index = PropertyIndex()
+    for r in rows:
+        index.add(r)
+    groups = index.groups()
+    assert len(rows) == 5 and len(groups) == 4, (len(rows), len(groups))
+    erie = next(g for g in groups if len(g) == 2)
+    assert {r["site"] for r in erie} == {"Redfin", "Zillow"}, erie
+    merged = [r for r in index.merged_rows(keep_sources=True) if r["row_type"] == "merged"]
+    assert len({r["property_key"] for r in merged}) == 4
+
+def check_parquet_recovery(tmp: pathlib.Path) -> None:
+    root = tmp / "listings_parquet"
+    sink = sinks.ParquetSink(root)
+    for n in range(3):
+        sink.write(fake_row(n))
+    sink.close(3)
+    crashed = sinks.ParquetSink(root, resume=True)
+    crashed.write(fake_row(3))
+    crashed._flush()  # the .part is left behind, as after a kill
+    resumed = sinks.ParquetSink(root, resume=True)
+    assert resumed.recovering and resumed.csv_rows == 3, (resumed.recovering, resumed.csv_rows)
+    assert list(root.glob("*/*.parquet.part")) == [resumed.tmp]  # the stale one is gone
+    resumed.write(fake_row(3))
+    resumed.close(4)
+    rows = sinks.pq.read_table(root).to_pylist()
+    assert sorted(r["url"] for r in rows) == sorted(fake_row(n)["url"] for n in range(4)), rows
+    assert set(rows[0]) >= set(FIELDNAMES)
+
+CHECKS: List[Callable[[pathlib.Path], None]] = [
+    check_row_writer_resume, check_input_order, check_token_bucket, check_property_index,
+]
+if sinks.pa is not None:
+    CHECKS.append(check_parquet_recovery)
+
+def main() -> int:
+    failed = 0
+    for check in CHECKS:
+        with tempfile.TemporaryDirectory() as tmp:
+            try:
+                check(pathlib.Path(tmp))
+                print(f"{check.__name__}: ok")
+            except Exception:
+                failed += 1
+                print(f"{check.__name__}: FAILED")
+                traceback.print_exc()
+    if sinks.pa is None:
+        print("check_parquet_recovery: skipped (no pyarrow)")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,23 @@
 # compile_listings.py
 # Purpose: visit Redfin/Zillow listing pages, extract normalized fields, write CSV, package ZIP.
 
-import os, re, csv, json, zipfile, datetime, pathlib, textwrap
-from typing import Dict, Any, List, Optional, Tuple
+import os, re, sys, csv, gzip, json, math, time, heapq, datetime, pathlib, textwrap, argparse, asyncio, itertools, multiprocessing
+from urllib.parse import urlsplit
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from typing import (Dict, Any, List, Optional, Tuple, Callable, NamedTuple, Iterable, Iterator, Generator,
+                    AsyncIterator, Union)
+
+import download_images
+from snapshot_cache import SnapshotCache, DEFAULT_TTL_S, DEFAULT_MAX_BYTES
+from scrape_common import (FIELDNAMES, Pipeline, norm_num, csv_value, ms_since, site_name, listing_key,
+                           site_listing_id, domain_key)
+from rate_limit import FetchFailed, RateLimiter, check_response, DOMAIN_RATE, DEFAULT_RATE, MAX_RETRIES
+from http_tier import HttpTier, HTTP_WORKERS
+from sinks import (RunLock, RowWriter, InputOrder, ChangeStore, Change, ImageStage, ZipStreamer, checkpoint_path,
+                   open_parquet, zip_bundle, CHANGE_IGNORE_FIELDS)
+from property_merge import write_properties, MERGE_PRIORITY
 
 # ----------------------------
 # CONFIG
@@ -19,26 +34,80 @@ OUT_DIR = pathlib.Path("out")
 CSV_PATH = OUT_DIR / "listings.csv"
 ZIP_PATH = OUT_DIR / "property-scrapes-redfin-zillow.zip"
 
-# Throttle politely if you expand this list.
 NAV_TIMEOUT_MS = 40_000
 
+# Run metrics (--metrics): every run prints p50/p95/max per stage; --metrics also appends one JSON
+# line per listing plus a run summary line to METRICS_PATH, so runs can be compared over time.
+METRICS_PATH = OUT_DIR / "metrics.jsonl"
+
+# Browser pool: browsers launched once per run; a page is recycled (fresh context) after N navigations.
+# More than one browser only helps --concurrency, whose pages are spread across them; the sequential
+# engine has one page in flight at a time and always runs a single browser.
+POOL_SIZE = 1
+PAGE_RECYCLE_AFTER = 25
+USER_AGENT = ("Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/124.0 Safari/537.36")
+
+# Async engine: pages in flight at once, capped per domain (suffix match on host).
+CONCURRENCY = 6
+DOMAIN_CONCURRENCY = {
+    "redfin.com": 2,
+    "zillow.com": 2,
+}
+
+# Render readiness: instead of a fixed sleep, wait until every selector for the site is attached
+# (bounded by READY_TIMEOUT_MS). Sites without an entry fall back to the fixed RENDER_WAIT_MS
+# sleep; a page that times out is only topped up to RENDER_WAIT_MS, never waits both.
+RENDER_WAIT_MS = 1500
+READY_TIMEOUT_MS = 4000
+JSON_LD_SELECTOR = 'script[type="application/ld+json"]'
+READY_SELECTORS = {
+    "redfin.com": [JSON_LD_SELECTOR, '[data-rf-test-id="abp-homeinfo-homemainstats"]'],
+    "zillow.com": [JSON_LD_SELECTOR, '[data-testid="bed-bath-sqft-fact-container"]'],
+}
+
+# Resource blocking (--block-resources): extraction only needs the HTML and JSON-LD, so images,
+# fonts, media and third-party scripts are aborted. Per-site allow-list of resource types and
+# hosts; the top-level document is always allowed. Other sites only get same-host requests.
+DEFAULT_ALLOWED_TYPES = {"document", "script", "xhr", "fetch"}
+ALLOWED_RESOURCES = {
+    "redfin.com": {"types": DEFAULT_ALLOWED_TYPES, "hosts": ["redfin.com", "cdn-redfin.com"]},
+    "zillow.com": {"types": DEFAULT_ALLOWED_TYPES, "hosts": ["zillow.com", "zillowstatic.com"]},
+}
+
+# Process-pool extraction (--extract-workers N): fetchers hand raw HTML to N extractor processes
+# (the regex work in row_from_html holds the GIL) and go back to fetching. At most
+# EXTRACT_QUEUE_SIZE pages wait for an extractor; a fetcher that finds the queue full blocks until
+# one is done, so memory is bounded by the queue rather than by how far fetching runs ahead.
+# Extractor processes are spawned, not forked: by then Playwright, HTTP and image threads are
+# running, and a forked child would inherit their locks in whatever state they were in.
+EXTRACT_QUEUE_SIZE = 16
+EXTRACT_START_METHOD = "spawn"
+
+# Output paths of the optional stages; how each is written, and its knobs, live with the code that
+# writes it (sinks.py, property_merge.py).
+PROPERTIES_CSV_PATH = OUT_DIR / "properties.csv"   # --merge: one row per property
+IMAGES_DIR = OUT_DIR / "images"                    # --download-images, laid out as download_images.py does
+PARQUET_DIR = OUT_DIR / "listings_parquet"         # --parquet: one file per run, scrape_date= partitions
+CHANGES_DB_PATH = OUT_DIR / "listings.sqlite"      # --changes: last-known row per listing
+CHANGES_CSV_PATH = OUT_DIR / "changes.csv"         # --changes: this run's change log
+
+# Listing photos: the CDNs serve each photo in several sizes (Redfin mbpaddedwide/bigphoto/islphoto
+# paths, Zillow -cc_ft_384/768/1536 suffixes). extract_images keeps one URL per photo, picked by
+# IMAGE_SIZE_POLICY ("largest" or "smallest"), in the order photos first appear on the page.
+IMAGE_SIZE_POLICY = "largest"
+MAX_IMAGES = 20
+REDFIN_VARIANT_SIZE = {"mbpaddedwide": 1, "bigphoto": 2, "islphoto": 3}  # unknown variants: 0
+
 # ----------------------------
 # UTILITIES
 # ----------------------------
-def norm_num(s: Optional[str]) -> Optional[float]:
-    if not s:
+def first_match(text: str, patterns: List[re.Pattern], needles: Tuple[str, ...] = (),
+                folded: Optional[str] = None) -> Optional[str]:
+    # needles: lower-case literals at least one of which every pattern requires. With the
+    # folded text at hand, a page that contains none of them skips the regex scans entirely.
+    if needles and folded is not None and not any(n in folded for n in needles):
         return None
-    s2 = s.replace(",", "").strip()
-    try:
-        if s2.endswith("+"):  # e.g., "3+"
-            s2 = s2[:-1]
-        return float(s2)
-    except:
-        # Try to pull the first number in the string
-        m = re.search(r"[-+]?\d*\.?\d+", s2)
-        return float(m.group()) if m else None
-
-def first_match(text: str, patterns: List[re.Pattern]) -> Optional[str]:
     for p in patterns:
         m = p.search(text)
         if m:
@@ -53,7 +122,276 @@ def try_jsonloads(s: str) -> Optional[Any]:
         return None
 
 def collapse_ws(s: str) -> str:
-    return re.sub(r"\s+", " ", s or "").strip()
+    # Same result as re.sub(r"\s+", " ", s).strip(): str.split() uses the same whitespace set.
+    return " ".join((s or "").split())
+
+# ----------------------------
+# PARSED PAGE
+# ----------------------------
+TAG_SPLIT_RE = re.compile(r"(<[^>]+>)")
+JSON_LD_RE = re.compile(r'<script[^>]+type=["\']application/ld\+json["\'][^>]*>(.*?)</script>',
+                        re.DOTALL | re.IGNORECASE)
+# Under re.IGNORECASE these also match ASCII i/s/k; fold them so needle checks can't miss a match.
+IGNORECASE_FOLD = str.maketrans({"\u0130": "i", "\u0131": "i", "\u017f": "s", "\u212a": "k"})
+
+class ParsedPage:
+    """A listing page parsed once: visible text, folded text and JSON-LD shared by every extractor."""
+
+    def __init__(self, html: str, text: Optional[str] = None):
+        self.html = html
+        if text is None:
+            # split() alternates text/tag/text...; joining the text parts with " " is exactly
+            # re.sub(r"<[^>]+>", " ", html), in one pass instead of a substitution per tag.
+            text = collapse_ws(" ".join(TAG_SPLIT_RE.split(html)[0::2]))
+        self.text = text
+        self._folded: Optional[str] = None
+        self._json_lds: Optional[List[Dict[str, Any]]] = None
+
+    @property
+    def folded(self) -> str:
+        if self._folded is None:
+            t = self.text if self.text.isascii() else self.text.translate(IGNORECASE_FOLD)
+            self._folded = t.lower()
+        return self._folded
+
+    @property
+    def json_lds(self) -> List[Dict[str, Any]]:
+        if self._json_lds is None:
+            self._json_lds = extract_json_ld(self.html)
+        return self._json_lds
+
+    def first(self, patterns: List[re.Pattern], needles: Tuple[str, ...] = ()) -> Optional[str]:
+        return first_match(self.text, patterns, needles, self.folded)
+
+# ----------------------------
+# FIELD SPECS
+# ----------------------------
+# Declarative field table: output field -> compiled patterns (tried in order, first_match
+# semantics) -> normalizer. Built once at import.
+#
+# needles: lower-case literals every pattern needs; a page without any of them skips the field.
+# anchored: every match *starts* with one of the needles. Anchored fields of a group share one
+# candidate stream (every needle occurrence, in text order) and only run their patterns there,
+# anchored, instead of each searching the whole text. The leftmost candidate where a pattern
+# matches is exactly where search() would have found it.
+
+def raw_or_empty(s: Optional[str]) -> str:
+    return s or ""
+
+def to_int(s: Optional[str]) -> Optional[int]:
+    return int(s) if s else None
+
+def mls_code(s: Optional[str]) -> str:
+    return f"ARMLS #{s}" if s else ""
+
+class FieldSpec(NamedTuple):
+    name: str
+    patterns: Tuple[re.Pattern, ...]
+    normalize: Callable[[Optional[str]], Any]
+    needles: Tuple[str, ...] = ()
+    anchored: bool = False
+    group: str = ""
+
+def _res(*sources: str) -> Tuple[re.Pattern, ...]:
+    return tuple(re.compile(src, re.I) for src in sources)
+
+FIELD_SPECS: List[FieldSpec] = [
+    # Beds / Baths / Sqft / Lot: patterns start with the number, so they can't be anchored.
+    FieldSpec("bedrooms", _res(r'(\d+(?:\.\d+)?)\s*bd'), norm_num, ("bd",)),
+    FieldSpec("bathrooms", _res(r'(\d+(?:\.\d+)?)\s*ba'), norm_num, ("ba",)),
+    FieldSpec("sqft", _res(r'([\d,]+)\s*sq\s*ft'), norm_num, ("sq",)),
+    FieldSpec("lot_size", _res(r'Lot Size[:\s]+([\d,\.]+\s*(?:sq\s*ft|acres?))',
+                               r'([\d,\.]+\s*(?:sq\s*ft|acres?))\s+Lot Size'), raw_or_empty, ("lot size",)),
+    # Listing facts
+    FieldSpec("list_price", _res(r'\$\s*[\d,]+(?:,\d{3})*(?:\.\d{2})?'), norm_num, ("$",), True, "facts"),
+    FieldSpec("year_built", _res(r'Year Built[:\s]+(\d{4})'), to_int, ("year built",), True, "facts"),
+    FieldSpec("status", _res(r'(For sale|Pending|Active|Contingent|Sold)'), raw_or_empty,
+              ("for sale", "pending", "active", "contingent", "sold"), True, "facts"),
+    FieldSpec("mls_code", _res(r'(?:MLS|ARMLS)\s*#\s*([\w\d-]+)'), mls_code, ("mls", "armls"), True, "facts"),
+    FieldSpec("hoa_dues", _res(r'HOA[^$]*\$\s?[\d,]+(?:\/(?:mo|month|yr|year|qtr|quarter|semi-ann(?:ually)?))?',
+                               r'No HOA'), raw_or_empty, ("hoa", "no hoa"), True, "facts"),
+    # Parcel/APN (weak regex fallback)
+    FieldSpec("parcel_number", _res(r'(?:Parcel|APN)\s*[:#]?\s*([A-Za-z0-9\-]+)'), raw_or_empty,
+              ("parcel", "apn"), True, "facts"),
+    # Property type heuristic
+    FieldSpec("property_type",
+              _res(r'(Single[- ]Family(?: Residence)?|Townhouse|Condo|minium|Multi[- ]Family|Manufactured|Apartment)'),
+              raw_or_empty, ("single", "townhouse", "condo", "minium", "multi", "manufactured", "apartment"),
+              True, "facts"),
+    # Unit number (if present in text)
+    FieldSpec("unit_number", _res(r'Unit\s*#?\s*([A-Za-z0-9\-]+)'), raw_or_empty, ("unit",), True, "facts"),
+    # "Date on market" / "listing updated" / last sale (best effort)
+    FieldSpec("listing_added_date",
+              _res(r'(?:Date on market|On Redfin)\s*[:]?\s*([A-Za-z]{3,9}\s+\d{1,2},\s*\d{4}|\d+\s+day[s]?\s+ago|\d+/\d+/\d+)',
+                   r'Date on market[:\s]+([\d/-]{6,10}|[A-Za-z]{3,9}\s+\d{1,2},\s*\d{4})'),
+              raw_or_empty, ("date on market", "on redfin"), True, "history"),
+    FieldSpec("listing_updated_date",
+              _res(r'Listing updated[:\s]+([A-Za-z]{3,9}\s+\d{1,2},\s*\d{4}[^,]*\b(?:am|pm)?|\d+/\d+/\d+\s+\d+:\d+\s*(?:am|pm)?)'),
+              raw_or_empty, ("listing updated",), True, "history"),
+    FieldSpec("last_sale_date",
+              _res(r'(?:Sold on|Last sale(?: date)?)[:\s]+([A-Za-z]{3,9}\s+\d{1,2},\s*\d{4}|\d{4}-\d{2}-\d{2}|\d+/\d+/\d+)'),
+              raw_or_empty, ("sold on", "last sale"), True, "history"),
+    FieldSpec("last_sale_price", _res(r'(?:Sold for|Last sale price)[:\s]+\$[\d,]+'), norm_num,
+              ("sold for", "last sale price"), True, "history"),
+]
+FIELD_SPECS_BY_NAME = {spec.name: spec for spec in FIELD_SPECS}
+
+# Fallback: "233 E Erie Dr, Tempe, AZ 85282" pattern, only used when JSON-LD has no address.
+ADDRESS_SPEC = FieldSpec("address", _res(r'\d{1,6}\s+[^,]+,\s+[A-Za-z .\-]+,\s+AZ\s+\d{5}'), raw_or_empty, ("az",))
+
+class FieldTimer:
+    """Seconds spent per field (and per group scan), summed across pages."""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+
+    def add(self, name: str, dt: float) -> None:
+        self.seconds[name] = self.seconds.get(name, 0.0) + dt
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def report(self, top: int = 10) -> str:
+        lines = ["slowest fields:"]
+        for name, sec in sorted(self.seconds.items(), key=lambda kv: -kv[1])[:top]:
+            lines.append(f"  {name:<24} {sec * 1000:9.1f} ms total  {sec * 1000 / self.calls[name]:7.2f} ms/call")
+        return "\n".join(lines)
+
+# Per-field timing hook: set to a FieldTimer (e.g. via --time-fields) to find slow patterns.
+FIELD_TIMER: Optional[FieldTimer] = None
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0..100) of a non-empty list.
+
+    >>> percentile([10, 1000], 50), percentile([1, 2, 3, 4, 5, 6], 50), percentile([1, 2, 3, 4, 5, 6], 95)
+    (10, 3, 6)
+    >>> percentile([7], 0), percentile([1, 2, 3, 4], 100)
+    (7, 4)
+    """
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))]
+
+class RunMetrics:
+    """Per-stage timings for one run, printed as a table and appended to a JSONL log."""
+
+    # per-listing timings live in each fetch stats dict; run-level stages (browser_launch,
+    # csv_write, zip, ...) go through timed_stage()
+    LISTING_STAGES = ("http_ms", "goto_ms", "render_wait_ms", "content_ms", "extract_ms", "cache_ms", "write_ms")
+
+    def __init__(self):
+        self.started = datetime.datetime.now().isoformat(timespec="seconds")
+        self.t0 = time.perf_counter()
+        self.stages: Dict[str, List[float]] = {}
+
+    def add(self, name: str, ms: float) -> None:
+        self.stages.setdefault(name, []).append(ms)
+
+    def samples(self, listings: List[Dict[str, Any]]) -> Dict[str, List[float]]:
+        out = {name[:-3]: [s[name] for s in listings if name in s] for name in self.LISTING_STAGES}
+        out = {k: v for k, v in out.items() if v}
+        out.update(self.stages)
+        return out
+
+    def stats(self, listings: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+        return {name: {"n": len(v), "p50": percentile(v, 50), "p95": percentile(v, 95),
+                       "max": max(v), "total": round(sum(v), 1)}
+                for name, v in self.samples(listings).items()}
+
+    def summary(self, listings: List[Dict[str, Any]]) -> str:
+        lines = [f"stage timings (ms), run {time.perf_counter() - self.t0:.1f}s:",
+                 f"  {'stage':<18} {'n':>5} {'p50':>9} {'p95':>9} {'max':>9} {'total':>10}"]
+        for name, st in self.stats(listings).items():
+            lines.append(f"  {name:<18} {st['n']:>5} {st['p50']:>9.1f} {st['p95']:>9.1f} "
+                         f"{st['max']:>9.1f} {st['total']:>10.1f}")
+        return "\n".join(lines)
+
+    def write_jsonl(self, path: pathlib.Path, listings: List[Dict[str, Any]],
+                    extra: Optional[Dict[str, Any]] = None) -> None:
+        """Append one record per listing plus a run record, so runs can be compared over time."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("a", encoding="utf-8") as f:
+            for s in listings:
+                f.write(json.dumps({"type": "listing", "run": self.started, **s}) + "\n")
+            record = {"type": "run", "run": self.started, "listings": len(listings),
+                      "total_s": round(time.perf_counter() - self.t0, 3),
+                      "stages": self.stats(listings), **(extra or {})}
+            f.write(json.dumps(record) + "\n")
+
+# Run-level stage hook: main() sets this; library callers (benchmarks) may leave it None.
+RUN_METRICS: Optional[RunMetrics] = None
+
+@contextmanager
+def timed_stage(name: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        if RUN_METRICS is not None:
+            RUN_METRICS.add(name, ms_since(t0))
+
+def scan_group(page: ParsedPage, specs: List[FieldSpec], timer: Optional[FieldTimer] = None) -> Dict[str, Optional[str]]:
+    text, folded = page.text, page.folded
+    # (spec, pattern index) -> first value; a spec is settled once its first pattern has matched
+    found: Dict[Tuple[str, int], str] = {}
+    by_needle: Dict[str, List[FieldSpec]] = {}
+    for spec in specs:
+        for n in spec.needles:
+            by_needle.setdefault(n, []).append(spec)
+    unsettled = {s.name for s in specs}
+    t_scan = time.perf_counter() if timer else 0.0
+    # Merge the occurrences of every needle into one stream, in text order. A needle drops out
+    # once all of its fields are settled, so one slow field doesn't drag the others along.
+    heap = []
+    for n in by_needle:
+        p = folded.find(n)
+        if p >= 0:
+            heap.append((p, n))
+    heapq.heapify(heap)
+    while heap and unsettled:
+        pos, n = heapq.heappop(heap)
+        waiting = [spec for spec in by_needle[n] if spec.name in unsettled]
+        if not waiting:
+            continue
+        for spec in waiting:
+            t0 = time.perf_counter() if timer else 0.0
+            for j, pat in enumerate(spec.patterns):
+                if (spec.name, j) in found:
+                    continue
+                m = pat.match(text, pos)
+                if m:
+                    found[(spec.name, j)] = m.group(1) if m.groups() else m.group(0)
+                    if j == 0:
+                        unsettled.discard(spec.name)
+            if timer:
+                timer.add(spec.name, time.perf_counter() - t0)
+        nxt = folded.find(n, pos + 1)
+        if nxt >= 0:
+            heapq.heappush(heap, (nxt, n))
+    if timer:
+        timer.add(f"[{specs[0].group}] scan", time.perf_counter() - t_scan)
+    out: Dict[str, Optional[str]] = {}
+    for spec in specs:
+        out[spec.name] = next((found[(spec.name, j)] for j in range(len(spec.patterns))
+                               if (spec.name, j) in found), None)
+    return out
+
+def extract_fields(page: ParsedPage, specs: List[FieldSpec]) -> Dict[str, Optional[str]]:
+    """Raw (un-normalized) value for each spec; same results as first_match per field."""
+    timer = FIELD_TIMER
+    out: Dict[str, Optional[str]] = {}
+    groups: Dict[str, List[FieldSpec]] = {}
+    # Anchored scanning relies on folded and text lining up character for character.
+    aligned = len(page.folded) == len(page.text)
+    for spec in specs:
+        if spec.anchored and spec.group and aligned:
+            groups.setdefault(spec.group, []).append(spec)
+            continue
+        t0 = time.perf_counter() if timer else 0.0
+        out[spec.name] = first_match(page.text, list(spec.patterns), spec.needles, page.folded)
+        if timer:
+            timer.add(spec.name, time.perf_counter() - t0)
+    for members in groups.values():
+        out.update(scan_group(page, members, timer))
+    return out
 
 # ----------------------------
 # EXTRACTION LOGIC
@@ -61,8 +399,7 @@ def collapse_ws(s: str) -> str:
 def extract_json_ld(html: str) -> List[Dict[str, Any]]:
     """Return list of JSON-LD dicts."""
     out = []
-    for m in re.finditer(r'<script[^>]+type=["\']application/ld\+json["\'][^>]*>(.*?)</script>',
-                         html, flags=re.DOTALL|re.IGNORECASE):
+    for m in JSON_LD_RE.finditer(html):
         raw = m.group(1).strip()
         # JSON-LD may contain multiple objects or be wrapped in script-safe chars
         # Try a few cleanup passes
@@ -76,9 +413,10 @@ def extract_json_ld(html: str) -> List[Dict[str, Any]]:
                 break
     return out
 
-def extract_coords(html: str) -> Tuple[Optional[float], Optional[float]]:
-    # JSON-LD coordinates
-    json_lds = extract_json_ld(html)
+def extract_coords(html: str, json_lds: Optional[List[Dict[str, Any]]] = None) -> Tuple[Optional[float], Optional[float]]:
+    # JSON-LD coordinates (pass json_lds when already parsed)
+    if json_lds is None:
+        json_lds = extract_json_ld(html)
     for obj in json_lds:
         # Common LD structures:
         # obj["geo"] = {"@type":"GeoCoordinates","latitude":..,"longitude":..}
@@ -95,43 +433,55 @@ def extract_coords(html: str) -> Tuple[Optional[float], Optional[float]]:
         return float(m.group(1)), float(m.group(2))
     return None, None
 
-def extract_images(html: str, domain_hint: str) -> List[str]:
-    imgs = set()
-    if "redfin.com" in domain_hint:
-        for m in re.finditer(r'https://ssl\.cdn-redfin\.com/photo/[^\s"\'<>]+', html):
-            imgs.add(m.group(0))
-    if "zillow.com" in domain_hint:
-        for m in re.finditer(r'https://photos\.zillowstatic\.com/fp/[^\s"\'<>]+', html):
-            imgs.add(m.group(0))
-    return list(imgs)[:20]
-
-def parse_common_stats(text: str) -> Dict[str, Any]:
+REDFIN_PHOTO_RE = re.compile(r'https://ssl\.cdn-redfin\.com/photo/[^\s"\'<>]+')
+REDFIN_VARIANT_RE = re.compile(r'/photo/\d+/([a-z0-9]+)/\d+/(?:gen\w+\.)?(\d+_\d+)_')
+ZILLOW_PHOTO_RE = re.compile(r'https://photos\.zillowstatic\.com/fp/[^\s"\'<>]+')
+ZILLOW_VARIANT_RE = re.compile(r'/fp/([0-9a-f]+)-(\w+)\.\w+$')
+
+def photo_variant(url: str) -> Tuple[str, int]:
+    """(photo id, relative size) of a CDN photo URL; unrecognised URLs are their own photo."""
+    m = REDFIN_VARIANT_RE.search(url)
+    if m:
+        return m.group(2), REDFIN_VARIANT_SIZE.get(m.group(1), 0)
+    m = ZILLOW_VARIANT_RE.search(url)
+    if m:
+        return m.group(1), max((int(d) for d in re.findall(r"\d+", m.group(2))), default=0)
+    return url, 0
+
+def extract_images(html: str, domain_hint: str, policy: Optional[str] = None) -> List[str]:
+    """One URL per listing photo (variant chosen by policy, default IMAGE_SIZE_POLICY), in
+    first-appearance order, at most MAX_IMAGES."""
+    pattern = (REDFIN_PHOTO_RE if "redfin.com" in domain_hint else
+               ZILLOW_PHOTO_RE if "zillow.com" in domain_hint else None)
+    if pattern is None:
+        return []
+    pick = min if (policy or IMAGE_SIZE_POLICY) == "smallest" else max
+    photos: Dict[str, List[Tuple[int, str]]] = {}  # insertion order = first appearance
+    for m in pattern.finditer(html):
+        photo, size = photo_variant(m.group(0))
+        photos.setdefault(photo, []).append((size, m.group(0)))
+    return [pick(variants)[1] for variants in photos.values()][:MAX_IMAGES]
+
+# parse_common_stats keys -> FIELD_SPECS names
+COMMON_RAW_KEYS = {
+    "list_price_raw": "list_price",
+    "bedrooms_raw": "bedrooms",
+    "bathrooms_raw": "bathrooms",
+    "sqft_raw": "sqft",
+    "lot_size_raw": "lot_size",
+    "year_built_raw": "year_built",
+    "status_raw": "status",
+    "mls_raw": "mls_code",
+    "hoa_raw": "hoa_dues",
+}
+
+def parse_common_stats(text: str, folded: Optional[str] = None) -> Dict[str, Any]:
     # General text scraping patterns that work across both sites, then the site-specific steps fill gaps.
-    # Beds / Baths / Sqft
-    beds = first_match(text, [re.compile(r'(\d+(?:\.\d+)?)\s*bd', re.I)])
-    baths = first_match(text, [re.compile(r'(\d+(?:\.\d+)?)\s*ba', re.I)])
-    sqft = first_match(text, [re.compile(r'([\d,]+)\s*sq\s*ft', re.I)])
-    price = first_match(text, [re.compile(r'\$\s*[\d,]+(?:,\d{3})*(?:\.\d{2})?', re.I)])
-    lot = first_match(text, [
-        re.compile(r'Lot Size[:\s]+([\d,\.]+\s*(?:sq\s*ft|acres?))', re.I),
-        re.compile(r'([\d,\.]+\s*(?:sq\s*ft|acres?))\s+Lot Size', re.I),
-    ])
-    year_built = first_match(text, [re.compile(r'Year Built[:\s]+(\d{4})', re.I)])
-    status = first_match(text, [re.compile(r'(For sale|Pending|Active|Contingent|Sold)', re.I)])
-    mls = first_match(text, [re.compile(r'(?:MLS|ARMLS)\s*#\s*([\w\d-]+)', re.I)])
-    hoa = first_match(text, [re.compile(r'HOA[^$]*\$\s?[\d,]+(?:\/(?:mo|month|yr|year|qtr|quarter|semi-ann(?:ually)?))?', re.I),
-                              re.compile(r'No HOA', re.I)])
-    return {
-        "list_price_raw": price,
-        "bedrooms_raw": beds,
-        "bathrooms_raw": baths,
-        "sqft_raw": sqft,
-        "lot_size_raw": lot,
-        "year_built_raw": year_built,
-        "status_raw": status,
-        "mls_raw": mls,
-        "hoa_raw": hoa,
-    }
+    page = ParsedPage("", text)
+    if folded is not None:
+        page._folded = folded
+    raw = extract_fields(page, [FIELD_SPECS_BY_NAME[name] for name in COMMON_RAW_KEYS.values()])
+    return {key: raw[name] for key, name in COMMON_RAW_KEYS.items()}
 
 def extract_address_from_jsonld(json_lds: List[Dict[str, Any]]) -> Optional[str]:
     for obj in json_lds:
@@ -147,15 +497,19 @@ def extract_address_from_jsonld(json_lds: List[Dict[str, Any]]) -> Optional[str]
                 return out
     return None
 
-def site_specific_extract(domain: str, html: str, text: str) -> Dict[str, Any]:
+def site_specific_extract(domain: str, html: str, text: str,
+                          page: Optional[ParsedPage] = None, url: str = "") -> Dict[str, Any]:
+    # domain: the listing's host (www.redfin.com); url: the listing URL, for property_id_site.
+    # page: an existing parse of html/text, so callers that already have one don't re-parse.
+    if page is None:
+        page = ParsedPage(html, text)
     out: Dict[str, Any] = {}
-    json_lds = extract_json_ld(html)
+    json_lds = page.json_lds
 
     # Address
     addr = extract_address_from_jsonld(json_lds)
     if not addr:
-        # Fallback: "233 E Erie Dr, Tempe, AZ 85282" pattern
-        addr = first_match(text, [re.compile(r'\d{1,6}\s+[^,]+,\s+[A-Za-z .\-]+,\s+AZ\s+\d{5}', re.I)])
+        addr = extract_fields(page, [ADDRESS_SPEC])["address"]
     out["address"] = addr or ""
 
     # City/State/Zip (attempt to split)
@@ -172,58 +526,17 @@ def site_specific_extract(domain: str, html: str, text: str) -> Dict[str, Any]:
     out["state"] = state
     out["zip_code"] = zipcode
 
-    # Bed/Bath/Sqft/Lot/Year/Price/Status/MLS/HOA from common
-    cs = parse_common_stats(text)
-    out["list_price"] = norm_num(cs["list_price_raw"])
-    out["bedrooms"] = norm_num(cs["bedrooms_raw"])
-    out["bathrooms"] = norm_num(cs["bathrooms_raw"])
-    out["sqft"] = norm_num(cs["sqft_raw"])
-    out["lot_size"] = cs["lot_size_raw"] or ""
-    out["year_built"] = int(cs["year_built_raw"]) if cs["year_built_raw"] else None
-    out["status"] = cs["status_raw"] or ""
-    out["mls_code"] = f"ARMLS #{cs['mls_raw']}" if cs["mls_raw"] else ""
-    out["hoa_dues"] = cs["hoa_raw"] or ""
+    # Text fields: beds/baths/sqft/lot/year/price/status/MLS/HOA, parcel, type, unit, dates, last sale
+    raw = extract_fields(page, FIELD_SPECS)
+    for spec in FIELD_SPECS:
+        out[spec.name] = spec.normalize(raw[spec.name])
 
     # Coords
-    lat, lon = extract_coords(html)
+    lat, lon = extract_coords(html, json_lds)
     out["latitude"], out["longitude"] = lat, lon
 
-    # Parcel/APN (weak regex fallback)
-    parcel = first_match(text, [re.compile(r'(?:Parcel|APN)\s*[:#]?\s*([A-Za-z0-9\-]+)', re.I)])
-    out["parcel_number"] = parcel or ""
-
-    # Property type heuristic
-    ptype = first_match(text, [re.compile(r'(Single[- ]Family(?: Residence)?|Townhouse|Condo|minium|Multi[- ]Family|Manufactured|Apartment)', re.I)])
-    out["property_type"] = ptype or ""
-
-    # "Date on market" / "listing updated" (best effort)
-    listing_added = first_match(text, [
-        re.compile(r'(?:Date on market|On Redfin)\s*[:]?\s*([A-Za-z]{3,9}\s+\d{1,2},\s*\d{4}|\d+\s+day[s]?\s+ago|\d+/\d+/\d+)', re.I),
-        re.compile(r'Date on market[:\s]+([\d/-]{6,10}|[A-Za-z]{3,9}\s+\d{1,2},\s*\d{4})', re.I),
-    ]) or ""
-    listing_updated = first_match(text, [re.compile(r'Listing updated[:\s]+([A-Za-z]{3,9}\s+\d{1,2},\s*\d{4}[^,]*\b(?:am|pm)?|\d+/\d+/\d+\s+\d+:\d+\s*(?:am|pm)?)', re.I)]) or ""
-    out["listing_added_date"] = listing_added
-    out["listing_updated_date"] = listing_updated
-
-    # Last sale (weak)
-    last_sale_date = first_match(text, [re.compile(r'(?:Sold on|Last sale(?: date)?)[:\s]+([A-Za-z]{3,9}\s+\d{1,2},\s*\d{4}|\d{4}-\d{2}-\d{2}|\d+/\d+/\d+)', re.I)])
-    last_sale_price = first_match(text, [re.compile(r'(?:Sold for|Last sale price)[:\s]+\$[\d,]+', re.I)])
-    out["last_sale_date"] = last_sale_date or ""
-    out["last_sale_price"] = norm_num(last_sale_price) if last_sale_price else None
-
-    # Unit number (if present in path or text)
-    unit = first_match(text, [re.compile(r'Unit\s*#?\s*([A-Za-z0-9\-]+)', re.I)])
-    out["unit_number"] = unit or ""
-
-    # Site property id (Redfin home id or Zillow zpid) – derive from path or JSON
-    prop_id = ""
-    if "redfin.com" in domain:
-        m = re.search(r'/home/(\d+)', out["url"])
-        if m: prop_id = m.group(1)
-    elif "zillow.com" in domain:
-        m = re.search(r'/(\d+)_zpid/', out["url"])
-        if m: prop_id = m.group(1)
-    out["property_id_site"] = prop_id
+    # Site property id (Redfin home id or Zillow zpid) – derive from path
+    out["property_id_site"] = site_listing_id(domain, url)
 
     # images
     out["images"] = "|".join(extract_images(html, domain))
@@ -236,54 +549,744 @@ def site_specific_extract(domain: str, html: str, text: str) -> Dict[str, Any]:
 # Note: This uses Playwright to respect page rendering and load the same content a normal browser would.
 # Follow each site’s Terms of Use and robots.txt; this script is provided for personal, one-off use on the exact pages supplied.
 
-from playwright.sync_api import sync_playwright
+from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import async_playwright
+
+@dataclass
+class FetchOptions:
+    readiness: bool = True
+    block_resources: bool = False
+
+@dataclass
+class ScrapeOptions:
+    """Engine settings for one run; concurrency 0 is the sequential engine."""
+    fetch: FetchOptions = field(default_factory=FetchOptions)
+    concurrency: int = 0
+    domain_limits: Optional[Dict[str, int]] = None      # None: DOMAIN_CONCURRENCY
+    pool_size: int = POOL_SIZE
+    recycle_after: int = PAGE_RECYCLE_AFTER
+    extract_workers: int = 0
+    extract_queue: int = EXTRACT_QUEUE_SIZE
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> "ScrapeOptions":
+        return cls(fetch=FetchOptions(readiness=not args.fixed_wait, block_resources=args.block_resources),
+                   concurrency=args.concurrency, domain_limits=parse_domain_limits(args.domain_limit),
+                   pool_size=args.pool_size, recycle_after=args.recycle_after,
+                   extract_workers=args.extract_workers, extract_queue=args.extract_queue)
+
+class PageSlot:
+    """A context + page, its navigation count, and the fetch it is currently serving."""
+
+    def __init__(self, browser: Any):
+        self.browser = browser
+        self.ctx: Any = None
+        self.page: Any = None
+        self.navigations = 0
+        self.url = ""
+        self.stats: Dict[str, Any] = {}
+
+    def begin(self, url: str, stats: Dict[str, Any], opts: FetchOptions) -> None:
+        self.url, self.stats = url, stats
+        self.navigations += 1
+        stats["tier"] = "browser"
+        stats["bytes_loaded"] = 0
+        if opts.block_resources:
+            stats["requests_blocked"] = 0
+
+    def on_response(self, response) -> None:
+        # Content-Length only: reading bodies would cost more than the accounting is worth.
+        try:
+            self.stats["bytes_loaded"] = self.stats.get("bytes_loaded", 0) + int(
+                response.headers.get("content-length") or 0)
+        except ValueError:
+            pass
+
+    def allow(self, request) -> bool:
+        try:
+            main_frame = request.is_navigation_request() and request.frame == self.page.main_frame
+        except Exception:
+            main_frame = False  # e.g. service-worker requests have no frame
+        if allow_request(self.url, request.url, request.resource_type, main_frame):
+            return True
+        self.stats["requests_blocked"] = self.stats.get("requests_blocked", 0) + 1
+        return False
+
+def resource_policy(page_url: str) -> Tuple[set, List[str]]:
+    policy = ALLOWED_RESOURCES.get(domain_key(page_url, ALLOWED_RESOURCES))
+    if policy:
+        return policy["types"], policy["hosts"]
+    return DEFAULT_ALLOWED_TYPES, [urlsplit(page_url).hostname or ""]
+
+def allow_request(page_url: str, request_url: str, resource_type: str, main_frame: bool = False) -> bool:
+    """main_frame: a navigation of the page's main frame (the listing itself, plus any redirects),
+    always allowed. Other documents are iframes (ads, maps, analytics) and need an allowed host."""
+    types, hosts = resource_policy(page_url)
+    if resource_type == "document":
+        if main_frame:
+            return True
+    elif resource_type not in types:
+        return False
+    host = (urlsplit(request_url).hostname or "").lower()
+    return any(host == h or host.endswith("." + h) for h in hosts)
+
+class BrowserPool:
+    """Browsers launched once per run, handing out reusable pages."""
+
+    def __init__(self, size: int = POOL_SIZE, recycle_after: int = PAGE_RECYCLE_AFTER,
+                 headless: bool = True, opts: Optional[FetchOptions] = None,
+                 limiter: Optional[RateLimiter] = None):
+        self.size = max(1, size)
+        self.recycle_after = max(1, recycle_after)
+        self.headless = headless
+        self.opts = opts or FetchOptions()
+        self.limiter = limiter  # None: no throttling or retries
+        # Per-fetch stats, in fetch order (see load_page).
+        self.stats: List[Dict[str, Any]] = []
+        self._pw = None
+        self._browsers: List[Any] = []
+        # One slot per browser
+        self._slots: List[PageSlot] = []
+        self._next = 0
+
+    def __enter__(self) -> "BrowserPool":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
 
-def fetch_page(url: str) -> str:
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        ctx = browser.new_context(
-            user_agent="Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
-                       "(KHTML, like Gecko) Chrome/124.0 Safari/537.36")
+    def start(self) -> None:
+        if self._pw is not None:
+            return
+        self._pw = sync_playwright().start()
+        for _ in range(self.size):
+            with timed_stage("browser_launch"):
+                browser = self._pw.chromium.launch(headless=self.headless)
+            self._browsers.append(browser)
+            self._slots.append(PageSlot(browser))
+            self._open_page(self._slots[-1])
+
+    def _open_page(self, slot: PageSlot) -> None:
+        ctx = slot.browser.new_context(user_agent=USER_AGENT)
         page = ctx.new_page()
         page.set_default_timeout(NAV_TIMEOUT_MS)
-        page.goto(url, wait_until="domcontentloaded")
-        # Try to let client-side render fill in
-        page.wait_for_timeout(1500)
-        html = page.content()
-        browser.close()
-        return html
+        page.on("response", slot.on_response)
+        if self.opts.block_resources:
+            page.route("**/*", lambda route: route.continue_() if slot.allow(route.request) else route.abort())
+        slot.ctx, slot.page, slot.navigations = ctx, page, 0
+
+    def _recycle(self, slot: PageSlot) -> None:
+        try:
+            slot.ctx.close()
+        except Exception:
+            pass
+        self._open_page(slot)
+
+    def fetch(self, url: str) -> str:
+        attempt = 0
+        while True:
+            if self.limiter is not None:
+                self.limiter.wait(url)
+            try:
+                html = self._fetch_once(url)
+            except Exception as exc:
+                if self.limiter is None or not self.limiter.retry(url, exc, attempt):
+                    raise
+                attempt += 1
+                continue
+            if self.limiter is not None:
+                self.limiter.succeeded(url)
+            return html
+
+    def _fetch_once(self, url: str) -> str:
+        if self._pw is None:
+            self.start()
+        # Sync Playwright is single-threaded, so slots are simply handed out round-robin.
+        slot = self._slots[self._next % len(self._slots)]
+        self._next += 1
+        if slot.navigations >= self.recycle_after:
+            self._recycle(slot)
+        stats: Dict[str, Any] = {"url": url}
+        self.stats.append(stats)
+        slot.begin(url, stats, self.opts)
+        try:
+            return load_page(slot.page, url, stats, self.opts.readiness)
+        except Exception:
+            # Don't hand a page in an unknown state to the next URL.
+            self._recycle(slot)
+            raise
+
+    def close(self) -> None:
+        for browser in self._browsers:
+            try:
+                browser.close()
+            except Exception:
+                pass
+        self._browsers, self._slots = [], []
+        if self._pw is not None:
+            self._pw.stop()
+            self._pw = None
+
+def ready_selectors(url: str) -> List[str]:
+    return READY_SELECTORS.get(domain_key(url, READY_SELECTORS), [])
+
+def load_steps(url: str, stats: Optional[Dict[str, Any]] = None,
+               readiness: bool = True) -> Generator[Tuple[str, tuple, Dict[str, Any]], Any, str]:
+    """One page load as (method, args, kwargs) page calls; load_page/load_page_async only run them."""
+    t0 = time.perf_counter()
+    check_response(url, (yield "goto", (url,), {"wait_until": "domcontentloaded"}))
+    goto_ms = ms_since(t0)
+    # Let client-side render fill in, and record how long we actually waited.
+    t0 = time.perf_counter()
+    selectors = ready_selectors(url) if readiness else []
+    ready = False
+    if selectors:
+        deadline = t0 + READY_TIMEOUT_MS / 1000
+        try:
+            for sel in selectors:
+                remaining_ms = max(1, int((deadline - time.perf_counter()) * 1000))
+                yield "wait_for_selector", (sel,), {"state": "attached", "timeout": remaining_ms}
+            ready = True
+        except PlaywrightTimeoutError:
+            pass
+    if not ready:
+        # Never longer than the old fixed sleep, or the readiness wait that already timed out.
+        remaining_ms = RENDER_WAIT_MS - (time.perf_counter() - t0) * 1000
+        if remaining_ms > 0:
+            yield "wait_for_timeout", (int(remaining_ms),), {}
+    waited = {"render_wait_ms": round((time.perf_counter() - t0) * 1000, 1), "render_ready": ready}
+    t0 = time.perf_counter()
+    html = yield "content", (), {}
+    if stats is not None:
+        stats.update(waited, goto_ms=goto_ms, content_ms=ms_since(t0))
+    return html
+
+def load_page(page, url: str, stats: Optional[Dict[str, Any]] = None, readiness: bool = True) -> str:
+    steps = load_steps(url, stats, readiness)
+    result, error = None, None
+    while True:
+        try:
+            method, args, kwargs = steps.throw(error) if error else steps.send(result)
+        except StopIteration as done:
+            return done.value
+        result, error = None, None
+        try:
+            result = getattr(page, method)(*args, **kwargs)
+        except Exception as exc:
+            error = exc
+
+def fetch_page(url: str, pool: Optional[BrowserPool] = None,
+               limiter: Optional[RateLimiter] = None) -> str:
+    if pool is not None:
+        return pool.fetch(url)
+    # One-off fetch: launch, load, tear down.
+    with BrowserPool(size=1, limiter=limiter) as one_shot:
+        return one_shot.fetch(url)
+
+def summarize_render_waits(stats: List[Dict[str, Any]]) -> str:
+    waits = [s["render_wait_ms"] for s in stats if "render_wait_ms" in s]
+    if not waits:
+        return "render wait: no pages fetched"
+    ready = sum(1 for s in stats if s.get("render_ready"))
+    total = sum(waits)
+    saved = RENDER_WAIT_MS * len(waits) - total
+    return (f"render wait: {ready}/{len(waits)} pages ready early, avg {total / len(waits):.0f} ms/page, "
+            f"{saved / 1000:+.1f}s vs fixed {RENDER_WAIT_MS} ms sleep")
+
+def summarize_bytes(stats: List[Dict[str, Any]]) -> str:
+    loaded = [s["bytes_loaded"] for s in stats if "bytes_loaded" in s]
+    if not loaded:
+        return "transfer: no pages fetched"
+    blocked = sum(s.get("requests_blocked", 0) for s in stats)
+    return (f"transfer: {sum(loaded) / 1e6:.2f} MB over {len(loaded)} pages "
+            f"(avg {sum(loaded) / len(loaded) / 1e3:.0f} kB), {blocked} requests blocked")
+
+async def load_page_async(page, url: str, stats: Optional[Dict[str, Any]] = None,
+                          readiness: bool = True) -> str:
+    steps = load_steps(url, stats, readiness)
+    result, error = None, None
+    while True:
+        try:
+            method, args, kwargs = steps.throw(error) if error else steps.send(result)
+        except StopIteration as done:
+            return done.value
+        result, error = None, None
+        try:
+            result = await getattr(page, method)(*args, **kwargs)
+        except Exception as exc:
+            error = exc
+
+async def fetch_rows_async(urls: Union[Iterable[str], AsyncIterator[str]],
+                           opts: Optional[ScrapeOptions] = None,
+                           pipe: Optional[Pipeline] = None) -> List[Dict[str, Any]]:
+    """Fetch up to opts.concurrency pages at once; rows (and stats) come back in input order,
+    minus listings that failed (FetchFailed; pipe.on_skip hears about those). With pipe.on_row,
+    each row is handed over as it completes instead and the result is empty; with an extractor
+    too, a full extract queue holds fetchers back. on_html runs on a helper thread, so disk
+    writes (SnapshotCache.put) don't stall the loop. Pages are spread round-robin over
+    opts.pool_size browsers. urls may be an async iterator (HttpTier.escalations_async): pages
+    start as URLs arrive, and no browser is launched if none do."""
+    opts = opts or ScrapeOptions(concurrency=CONCURRENCY)
+    pipe = pipe or Pipeline()
+    concurrency = max(1, opts.concurrency)
+    limits = DOMAIN_CONCURRENCY if opts.domain_limits is None else opts.domain_limits
+    recycle_after, pool_size = opts.recycle_after, opts.pool_size
+    stats, on_html, on_row, on_skip = pipe.stats, pipe.on_html, pipe.on_row, pipe.on_skip
+    limiter, extractor, sink_room = pipe.limiter, pipe.extractor, pipe.sink_room
+    domain_sems: Dict[str, asyncio.Semaphore] = {}
+    rows: List[Optional[Dict[str, Any]]] = []
+    fetch_stats: List[Dict[str, Any]] = []
+
+    async def listed() -> AsyncIterator[str]:
+        for url in urls:
+            yield url
+    source = urls if hasattr(urls, "__aiter__") else listed()
+    try:
+        first = await source.__anext__()
+    except StopAsyncIteration:
+        return []
+    loop = asyncio.get_running_loop()
+    html_io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="html-sink")
+
+    async with async_playwright() as p:
+        browsers: List[Any] = []
+        launching = asyncio.Lock()
+        opened = itertools.count()
+
+        async def open_slot(browser: Optional[Any] = None) -> PageSlot:
+            if browser is None:
+                k = next(opened) % max(1, min(pool_size, concurrency))
+                async with launching:
+                    while len(browsers) <= k:
+                        with timed_stage("browser_launch"):
+                            browsers.append(await p.chromium.launch(headless=True))
+                browser = browsers[k]
+            slot = PageSlot(browser)
+            slot.ctx = await browser.new_context(user_agent=USER_AGENT)
+            slot.page = await slot.ctx.new_page()
+            slot.page.set_default_timeout(NAV_TIMEOUT_MS)
+            slot.page.on("response", slot.on_response)
+            if opts.fetch.block_resources:
+                async def route_handler(route):
+                    if slot.allow(route.request):
+                        await route.continue_()
+                    else:
+                        await route.abort()
+                await slot.page.route("**/*", route_handler)
+            return slot
+
+        # Free pages, opened as needed; taking one is the global concurrency cap.
+        slots: asyncio.Queue = asyncio.Queue()
+        slots_open = 0
+
+        async def take_slot() -> PageSlot:
+            nonlocal slots_open
+            if slots.empty() and slots_open < concurrency:
+                slots_open += 1
+                return await open_slot()
+            return await slots.get()
+
+        async def worker(i: int, url: str) -> None:
+            dom = domain_key(url, limits)
+            sem = domain_sems.get(dom)
+            if sem is None:
+                sem = domain_sems[dom] = asyncio.Semaphore(max(1, limits.get(dom, concurrency)))
+            attempt = 0
+            while True:
+                async with sem:
+                    if limiter is not None:
+                        await limiter.wait_async(url)
+                    slot = await take_slot()
+                    try:
+                        if slot.navigations >= recycle_after:
+                            await slot.ctx.close()
+                            slot = await open_slot(slot.browser)
+                        slot.begin(url, fetch_stats[i], opts.fetch)
+                        print(f"[*] Fetching {url}")
+                        try:
+                            html = await load_page_async(slot.page, url, fetch_stats[i],
+                                                         opts.fetch.readiness)
+                        except Exception as exc:
+                            await slot.ctx.close()
+                            slot = await open_slot(slot.browser)
+                            if limiter is None or not limiter.retry(url, exc, attempt):
+                                raise
+                            attempt += 1
+                            continue
+                    finally:
+                        slots.put_nowait(slot)
+                if limiter is not None:
+                    limiter.succeeded(url)
+                break
+            if extractor is not None:
+                await extractor.room_async()
+            if sink_room is not None:
+                await sink_room()
+            if on_html is not None:
+                t0 = time.perf_counter()
+                await loop.run_in_executor(html_io, on_html, url, html)
+                fetch_stats[i]["cache_ms"] = ms_since(t0)
+            row = finish_row(url, html, fetch_stats[i], None, on_row, extractor=extractor)
+            if on_row is None:
+                rows[i] = row
+
+        async def guarded(i: int, url: str) -> None:
+            try:
+                await worker(i, url)
+            except FetchFailed as exc:
+                print(f"[!] Skipping {url}: {exc}")
+                if on_skip is not None:
+                    on_skip(url)
+
+        tasks: List[asyncio.Future] = []
+
+        def start(url: str) -> None:
+            st: Dict[str, Any] = {"url": url}
+            fetch_stats.append(st)
+            if stats is not None:
+                stats.append(st)
+            rows.append(None)
+            tasks.append(asyncio.ensure_future(guarded(len(rows) - 1, url)))
+
+        try:
+            start(first)
+            async for url in source:
+                start(url)
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        finally:
+            for browser in browsers:
+                await browser.close()
+            html_io.shutdown(wait=True)
+    return [] if on_row is not None else [r for r in rows if r is not None]
+
+def build_rows_async(urls: Union[Iterable[str], AsyncIterator[str]], opts: Optional[ScrapeOptions] = None,
+                     pipe: Optional[Pipeline] = None) -> List[Dict[str, Any]]:
+    return asyncio.run(fetch_rows_async(urls, opts, pipe))
 
 # ----------------------------
 # MAIN
 # ----------------------------
-FIELDNAMES = [
-    "site","url","address","unit_number","city","state","zip_code","status",
-    "list_price","bedrooms","bathrooms","sqft","lot_size","property_type",
-    "year_built","mls_code","parcel_number","property_id_site",
-    "latitude","longitude","hoa_dues","listing_added_date","listing_updated_date",
-    "last_sale_date","last_sale_price","images"
-]
+def read_url_lines(src: str) -> Iterator[str]:
+    """URLs from a file ('-' = stdin), one per line; blank lines and # comments are skipped."""
+    f = sys.stdin if src == "-" else open(src, encoding="utf-8")
+    try:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield line
+    finally:
+        if f is not sys.stdin:
+            f.close()
 
-def site_name(url: str) -> str:
-    return "Redfin" if "redfin.com" in url else ("Zillow" if "zillow.com" in url else "")
+def unique_urls(urls: Iterable[str], seen: Optional[set] = None) -> Iterator[str]:
+    """First URL per listing_key, lazily; keys already in `seen` (e.g. resumed rows) are skipped."""
+    seen = set() if seen is None else seen
+    for url in urls:
+        key = listing_key(url)
+        if key in seen:
+            continue
+        seen.add(key)
+        yield url
+
+def row_from_html(url: str, html: str) -> Dict[str, Any]:
+    page = ParsedPage(html)
+    base = {
+        "site": site_name(url),
+        "url": url,
+    }
+    extracted = site_specific_extract(urlsplit(url).hostname or "", html, page.text, page, url)
+    row = {k: "" for k in FIELDNAMES}
+    row.update(base)
+    row.update(extracted)
+    return row
+
+def finish_row(url: str, html: str, stats: Dict[str, Any],
+               on_html: Optional[Callable[[str, str], None]] = None,
+               on_row: Optional[Callable[[Dict[str, Any]], None]] = None,
+               row: Optional[Dict[str, Any]] = None,
+               extractor: Optional["ExtractStage"] = None) -> Optional[Dict[str, Any]]:
+    """Cache, extract and hand on one fetched page, timing each step into its stats.
+    row: already extracted (and timed) by the caller. extractor: extract in its process pool
+    instead; the row reaches on_row from there and None is returned."""
+    if on_html is not None:
+        t0 = time.perf_counter()
+        on_html(url, html)
+        stats["cache_ms"] = ms_since(t0)
+    if row is None and extractor is not None and on_row is not None:
+        extractor.put(url, html, stats, on_row)
+        return None
+    if row is None:
+        t0 = time.perf_counter()
+        row = row_from_html(url, html)
+        stats["extract_ms"] = ms_since(t0)
+    if on_row is not None:
+        t0 = time.perf_counter()
+        on_row(row)
+        stats["write_ms"] = ms_since(t0)
+    return row
 
-def build_rows(urls: List[str]) -> List[Dict[str, Any]]:
+def build_rows(urls: Iterable[str], pool: Optional[BrowserPool] = None,
+               pipe: Optional[Pipeline] = None) -> List[Dict[str, Any]]:
+    # One page at a time through pool; pipe's hooks as for fetch_rows_async. Fetch stats stay
+    # in pool.stats. With on_row and an extractor, a page is extracted while the next one loads.
+    pipe = pipe or Pipeline()
+    if pool is None:
+        with BrowserPool(limiter=pipe.limiter) as run_pool:
+            return build_rows(urls, run_pool, pipe)
+    on_html, on_row, on_skip, extractor = pipe.on_html, pipe.on_row, pipe.on_skip, pipe.extractor
     rows = []
     for url in urls:
         print(f"[*] Fetching {url}")
-        html = fetch_page(url)
-        text = collapse_ws(re.sub(r"<[^>]+>", " ", html))
-        base = {
-            "site": site_name(url),
-            "url": url,
-        }
-        extracted = site_specific_extract(base["site"].lower(), html, text)
-        row = {k: "" for k in FIELDNAMES}
-        row.update(base)
-        row.update(extracted)
-        rows.append(row)
+        try:
+            html = fetch_page(url, pool)
+        except FetchFailed as exc:
+            print(f"[!] Skipping {url}: {exc}")
+            if on_skip is not None:
+                on_skip(url)
+            continue
+        row = finish_row(url, html, pool.stats[-1] if pool.stats else {}, on_html, on_row,
+                         extractor=extractor)
+        if on_row is None:
+            rows.append(row)
     return rows
 
+def scrape_rows(urls: List[str], opts: ScrapeOptions, pipe: Pipeline,
+                cache: Optional[SnapshotCache] = None,
+                http_tier: Optional["HttpTier"] = None) -> List[Dict[str, Any]]:
+    """Rows for urls in order: fresh cached snapshots are re-extracted, the rest are fetched
+    (with http_tier, by plain GET first; listings that fail are left out). With pipe.on_row,
+    rows are streamed to it as soon as every earlier URL is done (InputOrder) and [] is returned.
+    opts.extract_workers moves extraction into an ExtractStage process pool fed by all of these paths."""
+    by_url: Dict[str, Dict[str, Any]] = {}
+    order = InputOrder(urls, pipe.on_row) if pipe.on_row is not None else None
+    emit = order.row if order is not None else (lambda row: by_url.__setitem__(row["url"], row))
+    on_skip = order.skip if order is not None else None
+    extractor = None
+    if opts.extract_workers > 0 and FIELD_TIMER is None:  # field timings only add up in-process
+        extractor = ExtractStage(opts.extract_workers, opts.extract_queue)
+    fetch_stats = pipe.stats if pipe.stats is not None else []
+    inner = replace(pipe, stats=fetch_stats, on_html=cache.put if cache is not None else None,
+                    on_row=emit, on_skip=on_skip, extractor=extractor)
+    try:
+        todo: List[str] = []
+        for url in urls:
+            html = cache.get(url) if cache is not None else None
+            if html is None:
+                todo.append(url)
+                continue
+            print(f"[=] Cached   {url}")
+            stats: Dict[str, Any] = {"url": url, "cached": True}
+            fetch_stats.append(stats)
+            finish_row(url, html, stats, None, emit, extractor=extractor)
+        # With the HTTP tier, the browser takes its escalations as they are decided.
+        if todo and opts.concurrency > 0:
+            build_rows_async(todo if http_tier is None else http_tier.escalations_async(todo, inner),
+                             opts, inner)
+        elif todo:
+            escalated = iter(todo if http_tier is None else http_tier.escalations(todo, inner))
+            first = next(escalated, None)
+            if first is not None:
+                with BrowserPool(size=1, recycle_after=opts.recycle_after, opts=opts.fetch,
+                                 limiter=pipe.limiter) as pool:
+                    build_rows(itertools.chain([first], escalated), pool, inner)
+                    fetch_stats.extend(pool.stats)
+        if extractor is not None:
+            with timed_stage("extract_drain"):
+                extractor.close()
+            print(extractor.summary())
+        if order is not None and order.out_of_order:
+            print(order.summary())
+    except BaseException:
+        if extractor is not None:
+            extractor.abort()
+        raise
+    return [] if pipe.on_row is not None else [by_url[u] for u in urls if u in by_url]
+
+# ----------------------------
+# OFFLINE RE-EXTRACTION (--from-snapshots)
+# ----------------------------
+# Saved pages go through row_from_html in a process pool, so pattern changes can be checked
+# against thousands of pages in seconds. Workers get (url, path) pairs and read the page
+# themselves; only the small row dicts cross the process boundary.
+CANONICAL_URL_RE = re.compile(
+    r'<link[^>]+rel=["\']canonical["\'][^>]*href=["\']([^"\']+)|'
+    r'<meta[^>]+property=["\']og:url["\'][^>]*content=["\']([^"\']+)', re.IGNORECASE)
+SNAPSHOT_SNIFF_CHARS = 65536
+DIFF_EXAMPLES = 3
+# Bare pages named <site>_<id>.html (the fixtures/ layout) map back to a listing URL by id.
+SNAPSHOT_NAME_URLS = {
+    "redfin": "https://www.redfin.com/home/{}",
+    "zillow": "https://www.zillow.com/homedetails/{}_zpid/",
+}
+
+def snapshot_url(path: pathlib.Path, html: str) -> str:
+    """Listing URL for a bare .html file: its canonical/og:url link, else one built from the
+    file name (redfin_27927515.html -> .../home/27927515), else the file itself."""
+    m = CANONICAL_URL_RE.search(html, 0, SNAPSHOT_SNIFF_CHARS)
+    if m:
+        return m.group(1) or m.group(2)
+    site, _, pid = path.name.split(".", 1)[0].partition("_")
+    if pid.isdigit() and site in SNAPSHOT_NAME_URLS:
+        return SNAPSHOT_NAME_URLS[site].format(pid)
+    return path.resolve().as_uri()
+
+def extract_snapshot(job: Tuple[Optional[str], str]) -> Dict[str, Any]:
+    url, path = job
+    p = pathlib.Path(path)
+    data = p.read_bytes()
+    html = (gzip.decompress(data) if p.suffix == ".gz" else data).decode("utf-8", errors="replace")
+    return row_from_html(url or snapshot_url(p, html), html)
+
+def snapshot_jobs(src: pathlib.Path) -> List[Tuple[Optional[str], str]]:
+    """(url, path) pairs from a --cache-dir snapshot store, or from a directory of .html files."""
+    if (src / "index.json").exists():
+        cache = SnapshotCache(src, max_bytes=2**63)  # read-only use: never evict here
+        return [(u, str(cache.blob_path(u))) for u in cache.urls()]
+    return [(None, str(f)) for f in sorted(src.glob("*.html"))]
+
+def _init_extract_worker(image_size_policy: str) -> None:
+    # Workers may be spawned rather than forked, so carry main()'s settings over explicitly.
+    global IMAGE_SIZE_POLICY
+    IMAGE_SIZE_POLICY = image_size_policy
+
+def extract_snapshots(src: pathlib.Path, workers: int = 0) -> List[Dict[str, Any]]:
+    jobs = snapshot_jobs(src)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) < 2:
+        return [extract_snapshot(j) for j in jobs]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_extract_worker,
+                             initargs=(IMAGE_SIZE_POLICY,)) as ex:
+        return list(ex.map(extract_snapshot, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+
+# ----------------------------
+# PROCESS-POOL EXTRACTION (--extract-workers)
+# ----------------------------
+def extract_page(job: Tuple[str, str]) -> Tuple[Dict[str, Any], float]:
+    """row_from_html in an extractor process, with its own timing (extract_ms)."""
+    url, html = job
+    t0 = time.perf_counter()
+    row = row_from_html(url, html)
+    return row, ms_since(t0)
+
+class ExtractStage:
+    """Second pipeline stage: row_from_html on a process pool, fed raw HTML by the fetchers."""
+
+    def __init__(self, workers: int = 0, queue_size: int = EXTRACT_QUEUE_SIZE):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = max(1, queue_size)
+        self._ex = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_extract_worker,
+                                       initargs=(IMAGE_SIZE_POLICY,),
+                                       mp_context=multiprocessing.get_context(EXTRACT_START_METHOD))
+        self._pending: Dict[Future, Tuple[Dict[str, Any], Callable[[Dict[str, Any]], None]]] = {}
+        self.pages = 0
+        self.peak = 0
+        self.blocked_s = 0.0  # fetchers held back by a full queue
+
+    def put(self, url: str, html: str, stats: Dict[str, Any],
+            on_row: Callable[[Dict[str, Any]], None]) -> None:
+        """Submit a page; blocks only when queue_size pages are already waiting (room_async() is
+        the event-loop wait). Rows reach on_row on this thread, in completion order, so row sinks
+        are never called from two threads."""
+        if len(self._pending) >= self.queue_size:
+            t0 = time.perf_counter()
+            wait(self._pending, return_when=FIRST_COMPLETED)
+            self.blocked_s += time.perf_counter() - t0
+        self.drain()
+        self._pending[self._ex.submit(extract_page, (url, html))] = (stats, on_row)
+        self.peak = max(self.peak, len(self._pending))
+
+    async def room_async(self) -> None:
+        """Wait, without blocking the event loop, until put() would not block."""
+        t0 = time.perf_counter()
+        while len(self._pending) >= self.queue_size:
+            await asyncio.wait([asyncio.wrap_future(f) for f in self._pending],
+                               return_when=asyncio.FIRST_COMPLETED)
+            self.drain()
+        self.blocked_s += time.perf_counter() - t0
+
+    def drain(self) -> None:
+        """Hand on the rows of pages already extracted, without waiting."""
+        for fut in [f for f in self._pending if f.done()]:
+            stats, on_row = self._pending.pop(fut)
+            row, stats["extract_ms"] = fut.result()
+            t0 = time.perf_counter()
+            on_row(row)
+            stats.setdefault("write_ms", ms_since(t0))
+            self.pages += 1
+
+    def flush(self) -> None:
+        """Wait for every queued page and hand its row on."""
+        while self._pending:
+            wait(self._pending, return_when=FIRST_COMPLETED)
+            self.drain()
+
+    async def flush_async(self) -> None:
+        """flush() without blocking the event loop."""
+        while self._pending:
+            await asyncio.wait([asyncio.wrap_future(f) for f in self._pending],
+                               return_when=asyncio.FIRST_COMPLETED)
+            self.drain()
+
+    def close(self) -> None:
+        self.flush()
+        self._ex.shutdown()
+
+    def abort(self) -> None:
+        self._pending.clear()
+        self._ex.shutdown(wait=False, cancel_futures=True)
+
+    def summary(self) -> str:
+        return (f"extract pool: {self.pages} pages on {self.workers} processes, queue peak "
+                f"{self.peak}/{self.queue_size}, fetchers held back {self.blocked_s:.1f}s")
+
+def read_csv_rows(path: pathlib.Path) -> Dict[str, Dict[str, str]]:
+    if not path.exists():
+        return {}
+    with path.open(newline="", encoding="utf-8") as f:
+        return {r["url"]: r for r in csv.DictReader(f)}
+
+def diff_rows(old: Dict[str, Dict[str, str]], rows: List[Dict[str, Any]]) -> str:
+    """Per-field summary of what changed between the previous CSV and freshly extracted rows.
+    Rows are matched by listing_key, so a bare snapshot's URL (see snapshot_url) still meets the
+    live-scraped row for the same listing; CHANGE_IGNORE_FIELDS (the URL) aren't compared."""
+    by_key = {listing_key(u): r for u, r in old.items()}
+    changed: Dict[str, List[Tuple[str, str, str]]] = {k: [] for k in FIELDNAMES}
+    new_urls = 0
+    seen = set()
+    for row in rows:
+        key = listing_key(row["url"])
+        seen.add(key)
+        prev = by_key.get(key)
+        if prev is None:
+            new_urls += 1
+            continue
+        for k in FIELDNAMES:
+            if k in CHANGE_IGNORE_FIELDS:
+                continue
+            a, b = prev.get(k, ""), csv_value(row.get(k, ""))
+            if a != b:
+                changed[k].append((row["url"], a, b))
+    gone = sum(1 for key in by_key if key not in seen)
+    lines = [f"diff vs previous CSV: {len(rows) - new_urls} compared, {new_urls} new, {gone} missing"]
+    for k in FIELDNAMES:
+        if not changed[k]:
+            continue
+        lines.append(f"  {k:<22} {len(changed[k])} changed")
+        for url, a, b in changed[k][:DIFF_EXAMPLES]:
+            lines.append(f"    {url}\n      {textwrap.shorten(a, 80)!r} -> {textwrap.shorten(b, 80)!r}")
+    if len(lines) == 1:
+        lines.append("  no field changes")
+    return "\n".join(lines)
+
+# ----------------------------
+# BUNDLE FILES
+# ----------------------------
 def write_csv(path: pathlib.Path, rows: List[Dict[str, Any]]) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
     with path.open("w", newline="", encoding="utf-8") as f:
@@ -292,83 +1295,293 @@ def write_csv(path: pathlib.Path, rows: List[Dict[str, Any]]) -> None:
         for r in rows:
             w.writerow({k: r.get(k, "") for k in FIELDNAMES})
 
-def write_readme(path: pathlib.Path) -> None:
+def write_readme(path: pathlib.Path, with_images: bool = False, with_changes: bool = False) -> None:
+    images_note = ("- images/ holds the listing photos downloaded at build time (one folder per listings.csv row).\n"
+                   "- Run download_images.py after unzipping to fetch anything missing or changed since then."
+                   if with_images else
+                   "- This archive contains IMAGE URLS, not the images themselves.\n"
+                   "- Run download_images.py on your machine to populate the images/ directory.")
+    changes_note = ("- changes.csv — what changed since the previous run: one line per new listing and per changed "
+                    "field (old -> new). listings.csv holds only those new or changed listings.\n"
+                    if with_changes else "")
     contents = f"""PROPERTY SCRAPE BUNDLE
 Generated: {datetime.datetime.now().isoformat(timespec='seconds')}
 
 What’s included
 - listings.csv — tabular data for each requested URL with price, address, beds/baths, sqft, lot size, year built, MLS, parcel, HOA, listing dates, coordinates (when available), and image URL(s).
-- download_images.py — helper script to download all image URLs in listings.csv into ./images/<index>/ folders locally.
+{changes_note}- download_images.py — helper script to download all image URLs in listings.csv into ./images/<index>/ folders locally.
 
 Notes & limitations
-- This archive contains IMAGE URLS, not the images themselves.
-- Run download_images.py on your machine to populate the images/ directory.
+{images_note}
+- Re-running download_images.py only fetches missing or changed images (each folder keeps a manifest.json).
 - Values come from the public detail pages provided at run time. For bulk or automated crawling, follow each site’s Terms of Use and robots.txt.
 
 """
     path.write_text(contents, encoding="utf-8")
 
+DOWNLOADER_PATH = pathlib.Path(__file__).with_name("download_images.py")
+
 def write_downloader(path: pathlib.Path) -> None:
-    dl = r"""#!/usr/bin/env python3
-import csv, os, sys, pathlib, urllib.request, urllib.error
-
-CSV_PATH = pathlib.Path(__file__).parent / "listings.csv"
-IMAGES_DIR = pathlib.Path(__file__).parent / "images"
-IMAGES_DIR.mkdir(exist_ok=True)
-
-def safe_name(s):
-    return "".join(c for c in s if c.isalnum() or c in ("-", "_", ".", " ")).strip()
-
-def main():
-    if not CSV_PATH.exists():
-        print(f"Missing {CSV_PATH}")
-        sys.exit(1)
-
-    with open(CSV_PATH, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for idx, row in enumerate(reader, start=1):
-            raw = row.get("images") or ""
-            urls = [u.strip() for u in raw.split("|") if u.strip()]
-            if not urls:
-                continue
-            folder = IMAGES_DIR / f"{idx:02d}_{safe_name(row.get('address','unknown'))}"
-            folder.mkdir(parents=True, exist_ok=True)
-            for j, url in enumerate(urls, start=1):
-                ext = ".jpg"
-                for e in [".webp", ".jpg", ".jpeg", ".png"]:
-                    if url.lower().endswith(e):
-                        ext = e; break
-                out = folder / f"img_{j:02d}{ext}"
-                try:
-                    print(f"Downloading [{idx}/{j}]: {url} -> {out}")
-                    urllib.request.urlretrieve(url, out)
-                except urllib.error.HTTPError as e:
-                    print(f"HTTP error for {url}: {e.code}")
-                except urllib.error.URLError as e:
-                    print(f"URL error for {url}: {e.reason}")
-                except Exception as e:
-                    print(f"Failed {url}: {e}")
+    # Ship the standalone downloader that lives next to this script (stdlib only).
+    path.write_text(DOWNLOADER_PATH.read_text(encoding="utf-8"), encoding="utf-8")
 
-if __name__ == "__main__":
-    main()
-"""
-    path.write_text(dl, encoding="utf-8")
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Scrape Redfin/Zillow listing pages into listings.csv + ZIP bundle.")
+    ap.add_argument("--urls", default=None, metavar="FILE",
+                    help="read listing URLs from FILE ('-' = stdin) instead of URLS; duplicates are dropped")
+    ap.add_argument("--pool-size", type=int, default=POOL_SIZE,
+                    help="browsers to spread --concurrency pages over (default %(default)s); "
+                         "the sequential engine always uses one")
+    ap.add_argument("--recycle-after", type=int, default=PAGE_RECYCLE_AFTER,
+                    help="navigations before a page gets a fresh context (default %(default)s)")
+    ap.add_argument("--concurrency", type=int, default=0,
+                    help="pages in flight at once via the asyncio engine; 0 = sequential (default)")
+    ap.add_argument("--domain-limit", action="append", default=[], metavar="DOMAIN=N",
+                    help="per-domain cap for --concurrency, e.g. zillow.com=1 (repeatable)")
+    ap.add_argument("--rate", action="append", default=[], metavar="DOMAIN=REQ_PER_S",
+                    help="per-domain request rate ceiling, e.g. zillow.com=0.25 (repeatable; see DOMAIN_RATE)")
+    ap.add_argument("--max-retries", type=int, default=MAX_RETRIES,
+                    help="retries per listing after a 429/5xx/timeout (default %(default)s)")
+    ap.add_argument("--http-first", action="store_true",
+                    help="try a plain HTTP GET per listing first; only pages missing HTTP_REQUIRED_FIELDS "
+                         "open in the browser")
+    ap.add_argument("--http-workers", type=int, default=HTTP_WORKERS,
+                    help="concurrent GETs per host for --http-first (default %(default)s)")
+    ap.add_argument("--extract-workers", type=int, default=0,
+                    help="extract pages in this many processes while fetching continues; 0 = inline (default). "
+                         "Fetch-side parallelism is --concurrency / --pool-size / --http-workers")
+    ap.add_argument("--extract-queue", type=int, default=EXTRACT_QUEUE_SIZE,
+                    help="pages waiting for --extract-workers before fetchers block (default %(default)s)")
+    ap.add_argument("--fixed-wait", action="store_true",
+                    help=f"skip readiness detection and always sleep {RENDER_WAIT_MS} ms after load")
+    ap.add_argument("--block-resources", action="store_true",
+                    help="abort images, fonts, media and third-party scripts (see ALLOWED_RESOURCES)")
+    ap.add_argument("--image-size", choices=("largest", "smallest"), default=IMAGE_SIZE_POLICY,
+                    help="which CDN variant of each listing photo to keep (default %(default)s)")
+    ap.add_argument("--metrics", nargs="?", type=pathlib.Path, const=METRICS_PATH, default=None,
+                    metavar="FILE", help=f"append per-listing and per-run stage timings as JSON lines "
+                                         f"(default file {METRICS_PATH})")
+    ap.add_argument("--time-fields", action="store_true",
+                    help="time every field extraction and print the slowest fields")
+    ap.add_argument("--cache-dir", type=pathlib.Path, default=None,
+                    help="keep rendered HTML snapshots here; fresh ones are re-extracted instead of fetched")
+    ap.add_argument("--cache-ttl-hours", type=float, default=DEFAULT_TTL_S / 3600,
+                    help="snapshot age after which a URL is fetched again (default %(default)s)")
+    ap.add_argument("--cache-max-mb", type=float, default=DEFAULT_MAX_BYTES / 1e6,
+                    help="compressed snapshot budget; least recently used URLs are evicted (default %(default)s)")
+    ap.add_argument("--resume", action="store_true",
+                    help=f"skip URLs already checkpointed in {checkpoint_path(CSV_PATH).name} and append to the CSV")
+    ap.add_argument("--download-images", action="store_true",
+                    help=f"download listing photos into {IMAGES_DIR} while scraping (see download_images.py)")
+    ap.add_argument("--image-workers", type=int, default=download_images.WORKERS,
+                    help="photo downloads in flight for --download-images (default %(default)s)")
+    ap.add_argument("--image-thumbs", type=int, default=0, metavar="PX",
+                    help="with --download-images, also write thumbnails at most PX on the long edge")
+    ap.add_argument("--bundle-images", action="store_true",
+                    help=f"stream the photos under {IMAGES_DIR} into the ZIP (as --download-images lands them)")
+    ap.add_argument("--parquet", action="store_true",
+                    help=f"also write typed columns to {PARQUET_DIR}/scrape_date=<today>/ (needs pyarrow)")
+    ap.add_argument("--changes", nargs="?", type=pathlib.Path, const=CHANGES_DB_PATH, default=None,
+                    metavar="DB", help=f"only output listings that are new or changed since the last --changes run, "
+                                       f"logging old -> new per field to {CHANGES_CSV_PATH.name} (default DB {CHANGES_DB_PATH})")
+    ap.add_argument("--merge", action="store_true",
+                    help=f"also write {PROPERTIES_CSV_PATH.name}: one row per property across sites")
+    ap.add_argument("--merge-keep-sources", action="store_true",
+                    help="with --merge, follow each merged row with the per-site rows it came from")
+    ap.add_argument("--merge-priority", default=",".join(MERGE_PRIORITY), metavar="SITE,SITE",
+                    help="site order that wins a field both sites fill (default %(default)s)")
+    ap.add_argument("--from-snapshots", type=pathlib.Path, default=None, metavar="DIR",
+                    help="no browser: re-extract saved pages (a --cache-dir or a folder of .html files) into the CSV")
+    ap.add_argument("--workers", type=int, default=0,
+                    help="processes for --from-snapshots; 0 = one per CPU (default)")
+    return ap.parse_args(argv)
+
+def parse_rates(specs: List[str]) -> Dict[str, Tuple[float, float]]:
+    rates = dict(DOMAIN_RATE)
+    for spec in specs:
+        dom, _, r = spec.partition("=")
+        try:
+            rate = float(r)
+        except ValueError:
+            raise SystemExit(f"--rate expects DOMAIN=REQ_PER_S, got {spec!r}")
+        if not rate > 0:
+            raise SystemExit(f"--rate needs a rate above 0, got {spec!r}")
+        dom = dom.strip().lower()
+        rates[dom] = (rate, rates.get(dom, DEFAULT_RATE)[1])
+    return rates
 
-def zip_bundle(zip_path: pathlib.Path, files: List[pathlib.Path]) -> None:
-    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as z:
-        for f in files:
-            z.write(f, arcname=f.name)
+def parse_domain_limits(specs: List[str]) -> Dict[str, int]:
+    limits = dict(DOMAIN_CONCURRENCY)
+    for spec in specs:
+        dom, _, n = spec.partition("=")
+        if not n.strip().isdigit():
+            raise SystemExit(f"--domain-limit expects DOMAIN=N, got {spec!r}")
+        limits[dom.strip().lower()] = int(n)
+    return limits
+
+def main(argv: Optional[List[str]] = None):
+    global FIELD_TIMER, IMAGE_SIZE_POLICY, RUN_METRICS
+    args = parse_args(argv)
+    IMAGE_SIZE_POLICY = args.image_size
+    RUN_METRICS = RunMetrics()
+    if args.time_fields:
+        FIELD_TIMER = FieldTimer()
+    lock = RunLock(CSV_PATH)
+    try:
+        if args.from_snapshots is not None:
+            return main_from_snapshots(args)
+        return main_scrape(args)
+    finally:
+        lock.close()
 
-def main():
-    rows = build_rows(URLS)
-    write_csv(CSV_PATH, rows)
+def main_scrape(args: argparse.Namespace):
+    if args.pool_size > 1 and args.concurrency <= 0:
+        print(f"[!] --pool-size {args.pool_size} needs --concurrency: the sequential engine loads one "
+              f"page at a time, so it runs a single browser")
+    opts = ScrapeOptions.from_args(args)
+    fetch_stats: List[Dict[str, Any]] = []
+    cache = None
+    if args.cache_dir is not None:
+        cache = SnapshotCache(args.cache_dir, ttl_s=args.cache_ttl_hours * 3600,
+                              max_bytes=int(args.cache_max_mb * 1e6))
+    bundler = ZipStreamer(ZIP_PATH, IMAGES_DIR) if args.bundle_images else None
+    table = open_parquet(PARQUET_DIR, args.resume) if args.parquet else None
+    changes = (ChangeStore(args.changes, CHANGES_CSV_PATH, resume=args.resume)
+               if args.changes is not None else None)
+    images = None
+    http_tier = None
+    finished = False
+    try:
+        with RowWriter(CSV_PATH, resume=args.resume) as sink:
+            source = URLS if args.urls is None else read_url_lines(args.urls)
+            urls = list(unique_urls(source, {listing_key(u) for u in sink.done}))
+            if args.resume:
+                print(f"[=] Resuming: {len(sink.done)} URLs already done ({sink.kept} rows in {CSV_PATH}), "
+                      f"{len(urls)} to go")
+            limiter = RateLimiter.for_urls(len(urls), parse_rates(args.rate), args.max_retries)
+            http_tier = (HttpTier(row_from_html, args.http_workers, limiter, user_agent=USER_AGENT)
+                         if args.http_first else None)
+            row_sinks: List[Callable[[Dict[str, Any]], None]] = [sink.write]
+            if table is not None:
+                if table.recovering:
+                    skip = min(table.csv_rows, sink.kept)
+                    print(f"[=] Previous run left no Parquet output; re-adding its {sink.kept - skip} rows")
+                    with CSV_PATH.open(newline="", encoding="utf-8") as f:
+                        for row in itertools.islice(csv.DictReader(f), skip, None):
+                            table.write(row)
+                row_sinks.append(table.write)
+            if args.download_images:
+                images = ImageStage(IMAGES_DIR, sink.kept, args.image_workers, args.image_thumbs,
+                                    on_file=bundler.add if bundler is not None else None)
+                row_sinks.append(images.put)
+
+            def on_row(row: Dict[str, Any]) -> None:
+                change = changes.observe(row) if changes is not None else None
+                if changes is not None and change is None:
+                    sink.skip(row["url"])
+                    return
+                for write in row_sinks:
+                    write(row)
+                if change is not None:
+                    changes.record(change)
+            pipe = Pipeline(stats=fetch_stats, on_row=on_row, limiter=limiter,
+                            sink_room=images.room_async if images is not None else None)
+            scrape_rows(urls, opts, pipe, cache, http_tier)
+        finished = True
+    finally:
+        if http_tier is not None:
+            http_tier.close()
+        if cache is not None:
+            cache.close()
+        if changes is not None:
+            changes.close()
+        if images is not None:
+            print("[*] Waiting for image downloads...")
+            with timed_stage("image_wait"):
+                images.close()
+        if bundler is not None and not finished:
+            bundler.abort()
+        if table is not None and finished:
+            with timed_stage("parquet"):
+                # An interrupted run keeps its .part; --resume rebuilds it from the CSV.
+                table.close(sink.kept + sink.written)
     readme_path = OUT_DIR / "README.txt"
     downloader_path = OUT_DIR / "download_images.py"
-    write_readme(readme_path)
+    write_readme(readme_path, with_images=bundler is not None, with_changes=changes is not None)
     write_downloader(downloader_path)
-    zip_bundle(ZIP_PATH, [CSV_PATH, readme_path, downloader_path])
-    print(f"\nWrote: {CSV_PATH}")
+    bundle = [CSV_PATH, readme_path, downloader_path]
+    if changes is not None:
+        bundle.insert(1, CHANGES_CSV_PATH)
+    if args.merge:
+        with timed_stage("merge"):
+            print(merge_outputs(args))
+        bundle.insert(1, PROPERTIES_CSV_PATH)
+    with timed_stage("zip"):
+        if bundler is not None:
+            bundler.close(bundle, CSV_PATH)
+            print(bundler.summary())
+        else:
+            zip_bundle(ZIP_PATH, bundle)
+    if table is not None:
+        print(table.summary())
+    if changes is not None:
+        print(changes.summary())
+    print(f"\n{summarize_render_waits(fetch_stats)}")
+    print(summarize_bytes(fetch_stats))
+    print(limiter.summary())
+    if http_tier is not None:
+        print(http_tier.summary())
+    if FIELD_TIMER is not None:
+        print(FIELD_TIMER.report())
+    if cache is not None:
+        print(cache.summary())
+    print(RUN_METRICS.summary(fetch_stats))
+    if args.metrics is not None:
+        RUN_METRICS.write_jsonl(args.metrics, fetch_stats, {"urls": len(urls), "rows": sink.written})
+        print(f"Metrics: {args.metrics}")
+    print(f"Wrote: {CSV_PATH}")
     print(f"ZIP:   {ZIP_PATH}\n")
 
+def merge_outputs(args: argparse.Namespace) -> str:
+    priority = [p.strip() for p in args.merge_priority.split(",") if p.strip()]
+    return write_properties(CSV_PATH, PROPERTIES_CSV_PATH, args.merge_keep_sources, priority)
+
+def main_from_snapshots(args: argparse.Namespace):
+    t0 = time.perf_counter()
+    with timed_stage("extract_snapshots"):
+        rows = extract_snapshots(args.from_snapshots, 1 if FIELD_TIMER is not None else args.workers)
+    elapsed = time.perf_counter() - t0
+    print(f"Re-extracted {len(rows)} snapshots from {args.from_snapshots} in {elapsed:.2f}s")
+    previous = read_csv_rows(CSV_PATH)
+    pending: List[Change] = []
+    if args.changes is not None:
+        changes = ChangeStore(args.changes, CHANGES_CSV_PATH)
+        found = [(row, changes.observe(row)) for row in rows]
+        rows = [row for row, change in found if change is not None]
+        pending = [change for _, change in found if change is not None]
+    with timed_stage("csv_write"):
+        write_csv(CSV_PATH, rows)
+    if args.changes is not None:
+        with changes:
+            for change in pending:
+                changes.record(change)
+        print(changes.summary())
+    table = open_parquet(PARQUET_DIR) if args.parquet else None
+    if table is not None:
+        for row in rows:
+            table.write(row)
+        table.close(len(rows))
+        print(table.summary())
+    print(diff_rows(previous, rows))
+    if args.merge:
+        print(merge_outputs(args))
+    if FIELD_TIMER is not None:
+        print(FIELD_TIMER.report())
+    print(RUN_METRICS.summary([]))
+    if args.metrics is not None:
+        RUN_METRICS.write_jsonl(args.metrics, [], {"rows": len(rows), "source": str(args.from_snapshots)})
+        print(f"Metrics: {args.metrics}")
+    print(f"Wrote: {CSV_PATH}")
+
 if __name__ == "__main__":
     main()
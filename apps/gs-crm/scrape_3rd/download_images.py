@@ -1,46 +1,707 @@
 #!/usr/bin/env python3
-import csv, os, sys, pathlib, urllib.request, urllib.error
+# download_images.py
+# Purpose: download every image URL in listings.csv into images/<NN>_<address>/img_<MM>.<ext>.
+# Downloads run on a thread pool over keep-alive connections reused per host (one TCP/TLS
+# handshake per connection, not per image), with a cap on requests in flight per host.
+# Standard library only, so it runs as-is from the unzipped bundle.
+#
+# Re-runs are incremental: each folder keeps a manifest.json (file -> url, size, sha256, ETag,
+# Last-Modified). A file that is present and matches its manifest entry is revalidated with
+# If-None-Match / If-Modified-Since and left alone on 304; anything else is downloaded to a
+# .part file and renamed into place, so an interrupted run never leaves a truncated image.
+#
+# Image bytes live once, in a content-addressed store (images/.store/ab/<sha256>.jpg); the
+# per-listing folders hold hardlinks into it (symlinks or copies where hardlinks are not
+# possible), and each distinct URL is requested once per run however many rows share it.
+#
+# --thumbs N adds <folder>/thumbs/img_MM.jpg, at most N px on the long edge, resized in a
+# process pool while downloads continue (needs Pillow; skipped with a notice without it).
+# Thumbnails are cached per blob, so a re-run only resizes photos that are new or changed.
+#
+#   python3 download_images.py --workers 8 --per-host 4 --thumbs 320
+
+import os, csv, sys, json, time, shutil, hashlib, pathlib, argparse, tempfile, threading, http.client
+from urllib.parse import urlsplit, urljoin
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+try:
+    from PIL import Image  # optional: only the --thumbs stage needs it
+except ImportError:
+    Image = None
 
 CSV_PATH = pathlib.Path(__file__).parent / "listings.csv"
 IMAGES_DIR = pathlib.Path(__file__).parent / "images"
-IMAGES_DIR.mkdir(exist_ok=True)
+
+WORKERS = 8
+PER_HOST = 4
+TIMEOUT_S = 30
+MAX_REDIRECTS = 3
+CHUNK = 64 * 1024
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) download_images.py"
+MANIFEST_NAME = "manifest.json"
+UMASK = os.umask(0)
+os.umask(UMASK)
+FLUSH_EVERY = 50  # JsonIndex writes are batched; flush() always writes
+THUMB_QUALITY = 80
+
+class DownloadError(Exception):
+    pass
 
 def safe_name(s):
     return "".join(c for c in s if c.isalnum() or c in ("-", "_", ".", " ")).strip()
 
-def main():
-    if not CSV_PATH.exists():
-        print(f"Missing {CSV_PATH}")
-        sys.exit(1)
+def image_ext(url):
+    # preserve file extension if present
+    for e in [".webp", ".jpg", ".jpeg", ".png"]:
+        if url.lower().endswith(e):
+            return e
+    return ".jpg"
+
+def listing_jobs(idx, row, images_dir=IMAGES_DIR):
+    """(label, url, out_path) for each image of the idx'th (1-based) row of listings.csv."""
+    raw = row.get("images") or ""
+    urls = [u.strip() for u in raw.split("|") if u.strip()]
+    # folder name includes index + short address
+    folder = images_dir / f"{idx:02d}_{safe_name(row.get('address', 'unknown'))}"
+    return [(f"{idx}/{j}", url, folder / f"img_{j:02d}{image_ext(url)}")
+            for j, url in enumerate(urls, start=1)]
+
+def read_jobs(csv_path):
+    """(label, url, out_path) for every image, in the same folder/filename layout as always."""
+    jobs = []
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for idx, row in enumerate(csv.DictReader(f), start=1):
+            jobs.extend(listing_jobs(idx, row))
+    return jobs
 
-    with open(CSV_PATH, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for idx, row in enumerate(reader, start=1):
-            raw = row.get("images") or ""
-            urls = [u.strip() for u in raw.split("|") if u.strip()]
-            if not urls:
+class ConnectionPool:
+    """Idle keep-alive connections per (scheme, host, port), shared by all worker threads,
+    plus a semaphore per host so no host sees more than per_host requests at once."""
+
+    def __init__(self, per_host=PER_HOST, timeout=TIMEOUT_S):
+        self.per_host = max(1, per_host)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._slots = {}
+        self.opened = 0
+
+    def _slot(self, key):
+        with self._lock:
+            sem = self._slots.get(key)
+            if sem is None:
+                sem = self._slots[key] = threading.BoundedSemaphore(self.per_host)
+            return sem
+
+    def _checkout(self, key):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+            self.opened += 1
+        scheme, host, port = key
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return cls(host, port, timeout=self.timeout), False
+
+    def _checkin(self, key, conn):
+        with self._lock:
+            self._idle.setdefault(key, []).append(conn)
+
+    def close(self):
+        """Close the idle connections; call once no request is in flight."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+    def download(self, url, out, validators=None):
+        """GET url into out (atomically), following redirects. validators: the manifest entry
+        for a copy already on disk, sent as If-None-Match / If-Modified-Since. Returns None on
+        304, else the new entry: url, size, sha256, etag, last_modified."""
+        for _ in range(MAX_REDIRECTS + 1):
+            location, entry = self._get(url, out, validators)
+            if location is None:
+                return entry
+            url = urljoin(url, location)
+        raise DownloadError(f"too many redirects for {url}")
+
+    def get(self, url, headers=None):
+        """GET url into memory, following redirects: (final url, status, headers, body).
+        Error statuses are returned rather than raised, so callers can apply their own policy."""
+        for _ in range(MAX_REDIRECTS + 1):
+            def read(resp):
+                return resp.status, {k.lower(): v for k, v in resp.getheaders()}, resp.read()
+            status, got, body = self._exchange(url, dict({"User-Agent": USER_AGENT}, **(headers or {})), read)
+            if status in (301, 302, 303, 307, 308) and got.get("location"):
+                url = urljoin(url, got["location"])
                 continue
-            # folder name includes index + short address
-            folder = IMAGES_DIR / f"{idx:02d}_{safe_name(row.get('address','unknown'))}"
-            folder.mkdir(parents=True, exist_ok=True)
-
-            for j, url in enumerate(urls, start=1):
-                # preserve file extension if present
-                ext = ".jpg"
-                for e in [".webp", ".jpg", ".jpeg", ".png"]:
-                    if url.lower().endswith(e):
-                        ext = e
+            return url, status, got, body
+        raise DownloadError(f"too many redirects for {url}")
+
+    def _get(self, url, out, validators=None):
+        headers = {"User-Agent": USER_AGENT, "Accept": "image/*,*/*;q=0.8"}
+        if validators:
+            if validators.get("etag"):
+                headers["If-None-Match"] = validators["etag"]
+            if validators.get("last_modified"):
+                headers["If-Modified-Since"] = validators["last_modified"]
+
+        def handle(resp):
+            if resp.status in (301, 302, 303, 307, 308) and resp.getheader("Location"):
+                resp.read()
+                return resp.getheader("Location"), None, None
+            if resp.status == 304 and validators:
+                resp.read()
+                return None, None, None
+            if resp.status >= 400:
+                resp.read()  # drain it so the connection can be reused
+                return None, None, DownloadError(f"HTTP error for {url}: {resp.status}")
+            return None, self._save(resp, url, out), None
+        location, entry, error = self._exchange(url, headers, handle)
+        if error is not None:
+            raise error
+        return location, entry
+
+    def _exchange(self, url, headers, handle):
+        # One GET on a pooled connection; handle(resp) reads the whole response and returns the result.
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in ("http", "https"):
+            raise DownloadError(f"unsupported URL {url}")
+        key = (scheme, parts.hostname, parts.port or (443 if scheme == "https" else 80))
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        with self._slot(key):
+            for attempt in range(2):
+                conn, reused = self._checkout(key)
+                try:
+                    conn.request("GET", path, headers=headers)
+                    resp = conn.getresponse()
+                    result = handle(resp)
+                except (http.client.HTTPException, OSError):
+                    conn.close()
+                    if reused and attempt == 0:
+                        continue  # the server dropped an idle keep-alive connection; redial once
+                    raise
+                if resp.will_close:
+                    conn.close()
+                else:
+                    self._checkin(key, conn)
+                return result
+
+    def _save(self, resp, url, out):
+        # Stream into a .part file next to out and rename it over out only once complete.
+        out.parent.mkdir(parents=True, exist_ok=True)
+        digest, size = hashlib.sha256(), 0
+        fd, tmp = tempfile.mkstemp(dir=out.parent, prefix=out.name + ".", suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while True:
+                    chunk = resp.read(CHUNK)
+                    if not chunk:
                         break
-                out = folder / f"img_{j:02d}{ext}"
+                    digest.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+            os.chmod(tmp, 0o666 & ~UMASK)  # mkstemp files are 0600; images get the usual mode
+            length = resp.getheader("Content-Length")
+            if length is not None and length.isdigit() and int(length) != size:
+                raise http.client.IncompleteRead(b"", int(length) - size)
+            os.replace(tmp, out)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+        return {"url": url, "size": size, "sha256": digest.hexdigest(),
+                "etag": resp.getheader("ETag"), "last_modified": resp.getheader("Last-Modified")}
+
+    def close(self):
+        with self._lock:
+            for conns in self._idle.values():
+                for c in conns:
+                    c.close()
+            self._idle = {}
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def write_json(path, data, **dump_opts):
+    """Write data to path as JSON through a temp file and a rename, so readers never see half a
+    file. The file gets the usual umask-derived mode (mkstemp files are 0600)."""
+    path = pathlib.Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".part")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(json.dumps(data, **dump_opts))  # one C-encoded string; json.dump() streams in Python
+        os.chmod(tmp, 0o666 & ~UMASK)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+class JsonIndex:
+    """A dict kept in one JSON file (the image store's and compile_listings' snapshot cache's
+    index.json). Writes are batched: changed() rewrites the file every `every` changes, or every
+    len/10 once the index is bigger, so rewriting it stays linear in the changes made; flush()
+    writes whatever is unsaved. An interrupted run loses at most one batch."""
+
+    def __init__(self, path, every=FLUSH_EVERY):
+        self.path = pathlib.Path(path)
+        self.every = max(1, every)
+        self.dirty = 0
+        try:
+            self.data = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            self.data = {}
+        except (OSError, ValueError):
+            print(f"[!] Ignoring unreadable index {self.path}")
+            self.data = {}
+
+    def changed(self, n=1):
+        self.dirty += n
+        if self.dirty >= max(self.every, len(self.data) // 10):
+            self.flush()
+
+    def flush(self):
+        if self.dirty:
+            write_json(self.path, self.data)
+            self.dirty = 0
+
+class Manifests:
+    """One manifest.json per image folder, loaded on first use and rewritten (atomically) as
+    soon as the last image of that folder is settled, so an interrupted run keeps what it
+    finished."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+        self._pending = {}
+
+    def expect(self, jobs):
+        """Register jobs before any of them can settle, so folders are written once, complete."""
+        with self._lock:
+            for _, _, out in jobs:
+                self._pending[out.parent] = self._pending.get(out.parent, 0) + 1
+
+    def entry(self, out):
+        with self._lock:
+            return self._load(out.parent).get(out.name)
+
+    def _load(self, folder):
+        data = self._data.get(folder)
+        if data is None:
+            try:
+                data = json.loads((folder / MANIFEST_NAME).read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                data = {}
+            self._data[folder] = data
+        return data
+
+    def settle(self, out, entry=None):
+        """Record out's new entry (if any); writes the folder's manifest once all its jobs are done."""
+        folder = out.parent
+        with self._lock:
+            data = self._load(folder)
+            if entry is not None:
+                data[out.name] = entry
+            self._pending[folder] -= 1
+            if self._pending[folder] or not folder.exists():
+                return
+            write_json(folder / MANIFEST_NAME, data, indent=1, sort_keys=True)
+
+class ImageStore:
+    """Content-addressed blobs under images/.store/<sha[:2]>/<sha256><ext>, plus index.json
+    mapping each image URL to the blob it last resolved to (sha256, size, ext, etag,
+    last_modified). Listing folders only hold links into the store, so a photo shared by
+    several rows (or URLs) is downloaded once per URL and stored once per content."""
+
+    def __init__(self, root=IMAGES_DIR / ".store", link_mode="hardlink"):
+        self.root = pathlib.Path(root)
+        self.link_mode = link_mode
+        self.index_path = self.root / "index.json"
+        self.incoming = self.root / "incoming"
+        self.incoming.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.links = {"hardlink": 0, "symlink": 0, "copy": 0}
+        self._index = JsonIndex(self.index_path)
+        self.index = self._index.data
+
+    def blob(self, entry):
+        sha = entry["sha256"]
+        return self.root / sha[:2] / f"{sha}{entry.get('ext', '')}"
+
+    def staging(self, url):
+        """Where a fresh download of url lands before it is filed under its hash."""
+        return self.incoming / hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def lookup(self, url, verify=False):
+        """url's index entry if its blob is still present and intact, else None."""
+        with self._lock:
+            entry = self.index.get(url)
+        if entry is None:
+            return None
+        blob = self.blob(entry)
+        try:
+            if blob.stat().st_size != entry["size"]:
+                return None
+        except OSError:
+            return None
+        if verify and file_sha256(blob) != entry["sha256"]:
+            return None
+        return entry
+
+    def add(self, url, path, entry, ext):
+        """File path under its hash and point url at it; returns the index entry. A finished
+        download is moved out of incoming/, a file adopted from an earlier run is linked."""
+        entry = dict(entry, ext=ext)
+        entry.pop("url", None)
+        blob = self.blob(entry)
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            current = blob.stat().st_size == entry["size"]
+        except OSError:
+            current = False
+        if path.parent == self.incoming:
+            if current:
+                path.unlink()
+            else:
+                os.replace(path, blob)
+        elif not current:
+            self._place(path, blob, "hardlink")
+        self._record(url, entry)
+        return entry
+
+    def _record(self, url, entry):
+        with self._lock:
+            self.index[url] = entry
+            self._index.changed()
+
+    def thumb(self, entry, size):
+        sha = entry["sha256"]
+        return self.root / "thumbs" / str(size) / sha[:2] / f"{sha}.jpg"
+
+    def link(self, entry, out):
+        """Point out at entry's blob (no-op if it already is)."""
+        self.link_file(self.blob(entry), out)
+
+    def link_file(self, blob, out):
+        try:
+            if os.path.samefile(blob, out):
+                return
+        except OSError:
+            pass
+        out.parent.mkdir(parents=True, exist_ok=True)
+        self._place(blob, out, self.link_mode)
+
+    def _place(self, src, dst, mode):
+        # Build the link (or copy) beside dst, then rename it over dst. A hardlink needs the
+        # store on the same filesystem, a symlink may need privileges (Windows), so each mode
+        # falls back to the next.
+        modes = ("hardlink", "symlink", "copy")
+        for mode in modes[modes.index(mode):]:
+            tmp = dst.with_name(f"{dst.name}.{threading.get_ident()}.part")
+            try:
+                if mode == "hardlink":
+                    os.link(src, tmp)
+                elif mode == "symlink":
+                    os.symlink(os.path.relpath(src, dst.parent), tmp)
+                else:
+                    shutil.copyfile(src, tmp)
+                os.replace(tmp, dst)
+            except OSError:
                 try:
-                    print(f"Downloading [{idx}/{j}]: {url} -> {out}")
-                    urllib.request.urlretrieve(url, out)
-                except urllib.error.HTTPError as e:
-                    print(f"HTTP error for {url}: {e.code}")
-                except urllib.error.URLError as e:
-                    print(f"URL error for {url}: {e.reason}")
+                    os.unlink(tmp)
+                except FileNotFoundError:
+                    pass
+                if mode == "copy":
+                    raise
+                continue
+            with self._lock:
+                self.links[mode] += 1
+            return
+
+    def prune(self):
+        """Delete blobs no URL in the index points at; returns (files, bytes) removed."""
+        keep = {self.blob(e) for e in self.index.values()}
+        shas = {e["sha256"] for e in self.index.values()}
+        files = nbytes = 0
+        for blob in self.root.glob("??/*"):
+            if blob not in keep:
+                nbytes += blob.stat().st_size
+                blob.unlink()
+                files += 1
+        for blob in self.root.glob("thumbs/*/??/*.jpg"):
+            if blob.stem not in shas:
+                nbytes += blob.stat().st_size
+                blob.unlink()
+                files += 1
+        return files, nbytes
+
+    def close(self):
+        with self._lock:
+            self._index.flush()
+
+    def summary(self):
+        blobs = {self.blob(e): e["size"] for e in self.index.values()}
+        links = ", ".join(f"{n} {k}s" for k, n in self.links.items() if n) or "no new links"
+        return (f"store: {len(self.index)} URLs -> {len(blobs)} blobs, "
+                f"{sum(blobs.values()) / 1e6:.1f} MB in {self.root}; {links}")
+
+def local_copy(manifests, url, outs, verify=False):
+    """An intact file from an earlier run (per its folder manifest) that can seed the store."""
+    for out in outs:
+        entry = manifests.entry(out)
+        try:
+            if (entry is None or entry.get("url") != url or entry.get("sha256") is None
+                    or out.stat().st_size != entry.get("size")):
+                continue
+        except OSError:
+            continue
+        if verify and file_sha256(out) != entry["sha256"]:
+            continue
+        return out, entry
+    return None, None
+
+def fetch_image(pool, store, manifests, url, outs, revalidate=True, verify=False):
+    """Resolve one URL to a store blob, downloading only if needed; outs are the folder paths
+    that list it (an intact copy there can seed the store). Returns (status, bytes, entry)."""
+    ext = image_ext(url)
+    entry = store.lookup(url, verify)
+    if entry is None:
+        path, seed = local_copy(manifests, url, outs, verify)
+        if path is not None:
+            entry = store.add(url, path, seed, ext)
+    status, size = "present", 0
+    if entry is None or revalidate:
+        staged = store.staging(url)
+        new = pool.download(url, staged, entry)
+        if new is None:
+            status = "unchanged"
+        else:
+            size = new["size"]
+            if entry is None:
+                status = "downloaded"
+            else:
+                status = "unchanged" if new["sha256"] == entry["sha256"] else "updated"
+            entry = store.add(url, staged, new, ext)
+    return status, size, entry
+
+# ---------------------------------------------------------------------------------------------
+# THUMBNAILS
+# ---------------------------------------------------------------------------------------------
+def thumb_is_fresh(src, dst):
+    try:
+        return dst.stat().st_mtime >= src.stat().st_mtime
+    except OSError:
+        return False
+
+def make_thumb(src, dst, size):
+    """Runs in a worker process: src image -> dst JPEG at most size px on the long edge."""
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_name(f"{dst.name}.{os.getpid()}.part")
+    try:
+        with Image.open(src) as im:
+            im.draft("RGB", (size, size))  # JPEG: decode at reduced scale, not full size
+            im.thumbnail((size, size))
+            if im.mode != "RGB":
+                im = im.convert("RGB")
+            im.save(tmp, "JPEG", quality=THUMB_QUALITY, optimize=True)
+        os.replace(tmp, dst)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+    return dst
+
+class Downloader:
+    """The download stage, for this script or in-process (compile_listings.py --download-images):
+    add() each listing's jobs as they arrive, close() waits for the rest and prints a summary.
+
+    Each URL is fetched once however many listings carry it; later listings are linked to the
+    same blob. add() blocks while max_pending URLs are queued, so a faster producer is held back
+    instead of buffering the whole run. on_file, if given, is called (from worker threads) with
+    each image or thumbnail path once it is complete in its listing folder."""
+
+    def __init__(self, images_dir=IMAGES_DIR, workers=WORKERS, per_host=PER_HOST, revalidate=True,
+                 verify=False, link_mode="hardlink", thumb_size=0, thumb_workers=None,
+                 max_pending=None, on_file=None):
+        if thumb_size and Image is None:
+            print("[!] --thumbs needs Pillow (pip install pillow); skipping thumbnails")
+            thumb_size = 0
+        self.revalidate, self.verify, self.thumb_size = revalidate, verify, thumb_size
+        self.on_file = on_file
+        self.pool = ConnectionPool(per_host)
+        self.store = ImageStore(pathlib.Path(images_dir) / ".store", link_mode)
+        self.manifests = Manifests()
+        self._ex = ThreadPoolExecutor(max_workers=max(1, workers))
+        self._room = threading.Semaphore(max_pending or max(1, workers) * 4)
+        self._resizer = ProcessPoolExecutor(max_workers=thumb_workers) if thumb_size else None
+        self._lock = threading.Lock()
+        self._urls = {}        # url -> {"targets": [(label, out)], "status": None, "entry": None}
+        self._futures = []
+        self._thumb_jobs = {}  # thumbnail path -> [future, source, folder thumbs to link to it]
+        self.images = self.nbytes = 0
+        self.counts = {"downloaded": 0, "updated": 0, "unchanged": 0, "present": 0, "failed": 0}
+        self.thumbs = {"made": 0, "fresh": 0, "failed": 0}
+        self.t0 = time.perf_counter()
+
+    def add(self, jobs):
+        self.manifests.expect(jobs)
+        for label, url, out in jobs:
+            with self._lock:
+                self.images += 1
+                rec = self._urls.get(url)
+                new = rec is None
+                if new:
+                    rec = self._urls[url] = {"targets": [(label, out)], "status": None, "entry": None}
+                elif rec["status"] is None:
+                    rec["targets"].append((label, out))  # in flight: linked when it lands
+                    continue
+            if new:
+                self._room.acquire()
+                self._futures.append(self._ex.submit(self._run, url, rec))
+            else:
+                self._attach(url, rec["entry"], [(label, out)])
+
+    def _run(self, url, rec):
+        try:
+            with self._lock:
+                outs = [out for _, out in rec["targets"]]
+            try:
+                status, size, entry = fetch_image(self.pool, self.store, self.manifests, url, outs,
+                                                  self.revalidate, self.verify)
+            except Exception as e:
+                status, size, entry = "failed", 0, None
+                print(e if isinstance(e, DownloadError) else f"Failed {url}: {e}")
+            with self._lock:
+                rec["status"], rec["entry"] = status, entry
+                targets = list(rec["targets"])
+                self.counts[status] += 1
+                self.nbytes += size
+            if status in ("downloaded", "updated"):
+                print(f"Downloaded [{', '.join(label for label, _ in targets)}]: {url}")
+            self._attach(url, entry, targets)
+        finally:
+            self._room.release()
+
+    def _attach(self, url, entry, targets):
+        # Link a resolved URL into the folders that list it (or just settle them if it failed).
+        for _, out in targets:
+            if entry is None:
+                self.manifests.settle(out)
+                continue
+            self.store.link(entry, out)
+            self.manifests.settle(out, {"url": url, "size": entry["size"], "sha256": entry["sha256"],
+                                        "etag": entry.get("etag"), "last_modified": entry.get("last_modified")})
+            self._placed(out)
+        if entry is not None and self._resizer is not None:
+            self._queue_thumb(entry, targets)
+
+    def _queue_thumb(self, entry, targets):
+        src, dst = self.store.blob(entry), self.store.thumb(entry, self.thumb_size)
+        outs = [out.parent / "thumbs" / f"{out.stem}.jpg" for _, out in targets]
+        with self._lock:
+            job = self._thumb_jobs.get(dst)
+            if job is not None:  # same photo under another URL (or listing): resize it once
+                job[2].extend(outs)
+                return
+            if not thumb_is_fresh(src, dst):
+                self._thumb_jobs[dst] = [self._resizer.submit(make_thumb, src, dst, self.thumb_size), src, outs]
+                return
+            self.thumbs["fresh"] += 1
+        for out in outs:
+            self.store.link_file(dst, out)
+            self._placed(out)
+
+    def _placed(self, out):
+        if self.on_file is not None:
+            self.on_file(out)
+
+    def close(self, prune=False):
+        """Wait for every queued download (and thumbnail), print the summary, return the counts."""
+        try:
+            self._ex.shutdown(wait=True)
+            for fut in self._futures:
+                if fut.exception() is not None:
+                    print(f"Failed: {fut.exception()}")
+            dt = time.perf_counter() - self.t0
+            for fut, src, outs in self._thumb_jobs.values():
+                try:
+                    dst = fut.result()
                 except Exception as e:
-                    print(f"Failed {url}: {e}")
+                    self.thumbs["failed"] += 1
+                    print(f"Thumbnail failed for {src}: {e}")
+                    continue
+                self.thumbs["made"] += 1
+                for out in outs:
+                    self.store.link_file(dst, out)
+                    self._placed(out)
+        finally:
+            self._ex.shutdown(wait=False, cancel_futures=True)
+            self.pool.close()
+            self.store.close()
+            if self._resizer is not None:
+                self._resizer.shutdown(cancel_futures=True)
+        print(f"{self.images} images, {len(self._urls)} unique URLs: " +
+              ", ".join(f"{n} {k}" for k, n in self.counts.items()) +
+              f"; {self.nbytes / 1e6:.1f} MB in {dt:.1f}s over {self.pool.opened} connections")
+        if self.thumb_size:
+            print(f"thumbnails ({self.thumb_size}px): " +
+                  ", ".join(f"{n} {k}" for k, n in self.thumbs.items()) +
+                  f"; done {time.perf_counter() - self.t0:.1f}s after start")
+        if prune:
+            files, freed = self.store.prune()
+            print(f"pruned {files} unreferenced blobs ({freed / 1e6:.1f} MB)")
+        print(self.store.summary())
+        return self.counts
+
+def download_all(jobs, prune=False, **opts):
+    dl = Downloader(**opts)
+    try:
+        dl.add(jobs)
+    finally:
+        counts = dl.close(prune)
+    return counts
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Download the image URLs in listings.csv into ./images/.")
+    ap.add_argument("--workers", type=int, default=WORKERS,
+                    help="downloads in flight across all hosts (default %(default)s)")
+    ap.add_argument("--per-host", type=int, default=PER_HOST,
+                    help="downloads in flight per host (default %(default)s)")
+    ap.add_argument("--no-revalidate", action="store_true",
+                    help="trust intact files on disk instead of sending conditional requests")
+    ap.add_argument("--verify", action="store_true",
+                    help="re-hash files on disk against their manifest sha256 before trusting them")
+    ap.add_argument("--link", choices=("hardlink", "symlink", "copy"), default="hardlink",
+                    help="how listing folders reference the image store (default %(default)s)")
+    ap.add_argument("--prune-store", action="store_true",
+                    help="delete store blobs that no image URL points at any more")
+    ap.add_argument("--thumbs", type=int, default=0, metavar="PX",
+                    help="also write thumbs/img_MM.jpg at most PX on the long edge (needs Pillow)")
+    ap.add_argument("--thumb-workers", type=int, default=None,
+                    help="resizing processes (default: one per CPU)")
+    args = ap.parse_args(argv)
+
+    if not CSV_PATH.exists():
+        print(f"Missing {CSV_PATH}")
+        sys.exit(1)
+    IMAGES_DIR.mkdir(exist_ok=True)
+    download_all(read_jobs(CSV_PATH), workers=args.workers, per_host=args.per_host,
+                 revalidate=not args.no_revalidate, verify=args.verify,
+                 link_mode=args.link, prune=args.prune_store,
+                 thumb_size=args.thumbs, thumb_workers=args.thumb_workers)
 
 if __name__ == "__main__":
     main()
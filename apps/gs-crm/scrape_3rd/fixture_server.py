@@ -0,0 +1,101 @@
+# fixture_server.py
+# Purpose: serve the saved listing pages in ./fixtures over local HTTP so fetch paths can be
+# benchmarked and dry-run without touching Redfin/Zillow. throttled_handler() adds a server-side
+# rate limit that answers 429 + Retry-After, to exercise the client's backoff.
+
+import re, time, pathlib, argparse, threading, functools
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from typing import List, Optional
+
+FIXTURES_DIR = pathlib.Path(__file__).parent / "fixtures"
+
+REDFIN_PATH_RE = re.compile(r'/home/(\d+)')
+ZILLOW_PATH_RE = re.compile(r'/(\d+)_zpid/')
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    # Listing-shaped paths map onto saved pages:
+    #   /AZ/Tempe/233-E-Erie-Dr-85282/home/27927515 -> redfin_27927515.html
+    #   /homedetails/.../7567189_zpid/             -> zillow_7567189.html
+    # Anything else is served from FIXTURES_DIR as-is.
+    def translate_path(self, path: str) -> str:
+        m = REDFIN_PATH_RE.search(path)
+        if m:
+            return str(FIXTURES_DIR / f"redfin_{m.group(1)}.html")
+        m = ZILLOW_PATH_RE.search(path)
+        if m:
+            return str(FIXTURES_DIR / f"zillow_{m.group(1)}.html")
+        return super().translate_path(path)
+
+    def log_message(self, format, *args):
+        pass
+
+def throttled_handler(max_rate: float, burst: float = 1, retry_after: Optional[int] = 1):
+    """A FixtureHandler that answers 429 once listing requests exceed max_rate per second
+    (token bucket shared by all connections). Counts land on the class: .served, .rejected."""
+    class ThrottledFixtureHandler(FixtureHandler):
+        lock = threading.Lock()
+        tokens = float(burst)
+        stamp = time.monotonic()
+        served = 0
+        rejected = 0
+
+        def do_GET(self):
+            cls = type(self)
+            if REDFIN_PATH_RE.search(self.path) or ZILLOW_PATH_RE.search(self.path):
+                with cls.lock:
+                    now = time.monotonic()
+                    cls.tokens = min(burst, cls.tokens + (now - cls.stamp) * max_rate)
+                    cls.stamp = now
+                    allowed = cls.tokens >= 1
+                    if allowed:
+                        cls.tokens -= 1
+                        cls.served += 1
+                    else:
+                        cls.rejected += 1
+                if not allowed:
+                    body = b"Too Many Requests"
+                    self.send_response(429)
+                    if retry_after is not None:
+                        self.send_header("Retry-After", str(retry_after))
+                    self.send_header("Content-Type", "text/plain")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+            super().do_GET()
+
+    return ThrottledFixtureHandler
+
+def serve(port: int = 0, handler=FixtureHandler) -> ThreadingHTTPServer:
+    """Start a fixture server on 127.0.0.1 in a daemon thread; port 0 picks a free one."""
+    httpd = ThreadingHTTPServer(("127.0.0.1", port),
+                                functools.partial(handler, directory=str(FIXTURES_DIR)))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+def fixture_urls(httpd: ThreadingHTTPServer) -> List[str]:
+    """One listing-shaped URL per saved page."""
+    host, port = httpd.server_address[:2]
+    urls = []
+    for f in sorted(FIXTURES_DIR.glob("*.html")):
+        site, _, pid = f.stem.partition("_")
+        if site == "redfin":
+            urls.append(f"http://{host}:{port}/AZ/fixture/home/{pid}")
+        elif site == "zillow":
+            urls.append(f"http://{host}:{port}/homedetails/fixture/{pid}_zpid/")
+    return urls
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--max-rate", type=float, default=0,
+                    help="listing requests/s before answering 429; 0 = no limit (default)")
+    args = ap.parse_args()
+    httpd = serve(args.port, throttled_handler(args.max_rate) if args.max_rate > 0 else FixtureHandler)
+    print("Serving fixtures:")
+    for u in fixture_urls(httpd):
+        print(f"  {u}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        httpd.shutdown()
@@ -0,0 +1,180 @@
+# http_tier.py
+# Purpose: --http-first, a plain-GET fetch tier in front of the browser. Most listing pages are
+# server-rendered, so a pooled GET (download_images.ConnectionPool: keep-alive, per-host cap) often
+# yields a complete row at a fraction of a browser navigation's cost.
+
+import re, time, asyncio, itertools, http.client
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Dict, Any, List, Optional, Tuple, Callable, Iterable, Iterator, AsyncIterator, Deque
+
+import download_images
+from scrape_common import Pipeline, site_name, domain_key, ms_since
+from rate_limit import RateLimiter, RETRY_STATUSES, parse_retry_after
+
+# When the server-rendered HTML already yields every HTTP_REQUIRED_FIELDS value the row is kept as
+# is; otherwise (missing fields, an error status, a bot wall) the listing escalates to Playwright.
+# GETs share the domain rate limits; HTTP_WORKERS caps them per host.
+HTTP_REQUIRED_FIELDS = ("address", "list_price", "bedrooms", "bathrooms", "sqft", "latitude", "longitude")
+HTTP_WORKERS = 4
+HTTP_TIMEOUT_S = 20
+
+class HttpTier:
+    """Plain pooled GETs in front of the browser; escalations() yields what still needs it."""
+
+    def __init__(self, extract: Callable[[str, str], Dict[str, Any]], workers: int = HTTP_WORKERS,
+                 limiter: Optional[RateLimiter] = None, required: Iterable[str] = HTTP_REQUIRED_FIELDS,
+                 user_agent: str = download_images.USER_AGENT):
+        self.extract = extract  # (url, html) -> row, as in the browser path
+        self.workers = max(1, workers)
+        self.limiter = limiter
+        self.required = tuple(required)
+        self.user_agent = user_agent
+        self.pool = download_images.ConnectionPool(per_host=self.workers, timeout=HTTP_TIMEOUT_S)
+        self._ex = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="http-tier")
+        self.tiers: Dict[str, Dict[str, int]] = {}      # site -> {"http": n, "escalated": n}
+        self.reasons: Dict[str, int] = {}               # why listings escalated
+
+    def _get(self, url: str, stats: Dict[str, Any]) -> Tuple[Optional[str], str]:
+        # (html, "") on a 200, else (None, why): the browser gets its own try, with its own retries.
+        if self.limiter is not None:
+            self.limiter.wait(url)
+        t0 = time.perf_counter()
+        try:
+            _, status, headers, body = self.pool.get(url, {"User-Agent": self.user_agent,
+                                                           "Accept": "text/html,application/xhtml+xml"})
+        except (download_images.DownloadError, http.client.HTTPException, OSError) as exc:
+            return None, type(exc).__name__
+        finally:
+            stats["http_ms"] = ms_since(t0)
+        if status in RETRY_STATUSES and self.limiter is not None:
+            # Throttled: back the domain off before the browser retries the same URL.
+            pause = self.limiter.penalize(url, parse_retry_after(headers.get("retry-after")))
+            print(f"[~] HTTP {status} on {url}; backing off {pause:.1f}s before the browser tries it")
+        if status != 200:
+            return None, f"HTTP {status}"
+        if self.limiter is not None:
+            self.limiter.succeeded(url)
+        stats["bytes_loaded"] = len(body)
+        charset = re.search(r"charset=([\w-]+)", headers.get("content-type", ""))
+        return body.decode(charset.group(1) if charset else "utf-8", errors="replace"), ""
+
+    def _submit(self, todo: Iterator[str], running: Dict[Future, Tuple[str, Dict[str, Any]]],
+                pipe: Pipeline) -> List[Future]:
+        # GETs in flight stay within a window, so a long URL list isn't queued all at once.
+        submitted = []
+        for url in itertools.islice(todo, self.workers * 2 - len(running)):
+            st: Dict[str, Any] = {"url": url, "tier": "http"}
+            if pipe.stats is not None:
+                pipe.stats.append(st)
+            fut = self._ex.submit(self._get, url, st)
+            running[fut] = (url, st)
+            submitted.append(fut)
+        return submitted
+
+    def _landed(self, url: str, st: Dict[str, Any], html: Optional[str], why: str, pipe: Pipeline,
+                escalated: Deque[str], on_html: Optional[Callable[[str, str], None]]) -> None:
+        # Decide one finished GET: keep its row, or queue the URL for the browser.
+        def settle(row: Optional[Dict[str, Any]]) -> None:
+            reason = why
+            if row is not None:
+                missing = [f for f in self.required if row.get(f) in (None, "")]
+                reason = f"missing {missing[0]}" if missing else ""
+            counts = self.tiers.setdefault(site_name(url) or domain_key(url), {"http": 0, "escalated": 0})
+            if reason:
+                st["escalated"] = reason
+                counts["escalated"] += 1
+                self.reasons[reason] = self.reasons.get(reason, 0) + 1
+                escalated.append(url)
+                return
+            print(f"[=] HTTP     {url}")
+            counts["http"] += 1
+            if on_html is not None:
+                t0 = time.perf_counter()
+                on_html(url, html)
+                st["cache_ms"] = ms_since(t0)
+            if pipe.on_row is not None:
+                t0 = time.perf_counter()
+                pipe.on_row(row)
+                st["write_ms"] = ms_since(t0)
+
+        if html is None:
+            settle(None)
+        elif pipe.extractor is not None:
+            pipe.extractor.put(url, html, st, settle)
+        else:
+            t0 = time.perf_counter()
+            row = self.extract(url, html)
+            st["extract_ms"] = ms_since(t0)
+            settle(row)
+
+    def escalations(self, urls: Iterable[str], pipe: Pipeline) -> Iterator[str]:
+        """Finish every listing whose static HTML carries self.required (rows go to pipe.on_row in
+        completion order); yields each URL that still needs the browser as soon as that is known,
+        and GETs keep going while the consumer works on it. GETs run on worker threads; extraction
+        and on_row stay on the consuming thread, so row sinks see single-threaded calls."""
+        todo, escalated = iter(urls), deque()
+        running: Dict[Future, Tuple[str, Dict[str, Any]]] = {}
+        self._submit(todo, running, pipe)
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                url, st = running.pop(fut)
+                self._landed(url, st, *fut.result(), pipe, escalated, pipe.on_html)
+            if pipe.extractor is not None:
+                pipe.extractor.drain()
+            self._submit(todo, running, pipe)
+            while escalated:
+                yield escalated.popleft()
+        if pipe.extractor is not None:
+            pipe.extractor.flush()  # the last verdicts may still be in the extract queue
+        while escalated:
+            yield escalated.popleft()
+
+    async def escalations_async(self, urls: Iterable[str], pipe: Pipeline) -> AsyncIterator[str]:
+        """escalations() for the async engine: waits without blocking the event loop, and
+        pipe.on_html (the snapshot cache) runs on helper threads."""
+        loop = asyncio.get_running_loop()
+        writes: List[asyncio.Future] = []
+
+        def store(url: str, html: str) -> None:
+            writes.append(loop.run_in_executor(None, pipe.on_html, url, html))
+        on_html = store if pipe.on_html is not None else None
+        todo, escalated = iter(urls), deque()
+        running: Dict[Future, Tuple[str, Dict[str, Any]]] = {}
+        waiting: Dict[asyncio.Future, Future] = {}
+        for fut in self._submit(todo, running, pipe):
+            waiting[asyncio.wrap_future(fut)] = fut
+        while running:
+            done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            for w in done:
+                fut = waiting.pop(w)
+                url, st = running.pop(fut)
+                html, why = fut.result()
+                if html is not None and pipe.extractor is not None:
+                    await pipe.extractor.room_async()
+                self._landed(url, st, html, why, pipe, escalated, on_html)
+            if pipe.extractor is not None:
+                pipe.extractor.drain()
+            for fut in self._submit(todo, running, pipe):
+                waiting[asyncio.wrap_future(fut)] = fut
+            while escalated:
+                yield escalated.popleft()
+        if pipe.extractor is not None:
+            await pipe.extractor.flush_async()
+        await asyncio.gather(*writes)
+        while escalated:
+            yield escalated.popleft()
+
+    def close(self) -> None:
+        self._ex.shutdown(wait=True, cancel_futures=True)
+        self.pool.close()
+
+    def summary(self) -> str:
+        if not self.tiers:
+            return "http tier: no listings tried"
+        sites = "; ".join(f"{site} {c['http']}/{c['http'] + c['escalated']} by HTTP"
+                          for site, c in sorted(self.tiers.items()))
+        reasons = ", ".join(f"{why} {n}" for why, n in sorted(self.reasons.items(), key=lambda kv: -kv[1]))
+        return (f"http tier: {sites}; {self.pool.opened} connections"
+                + (f"; escalated to browser: {reasons}" if reasons else ""))
@@ -0,0 +1,175 @@
+# property_merge.py
+# Purpose: --merge, consolidating the per-site rows of listings.csv (a Redfin and a Zillow listing
+# of the same house) into one row per property.
+
+import re, csv, pathlib
+from typing import Dict, Any, List, Optional, Iterator
+
+from scrape_common import FIELDNAMES, norm_num
+
+# Rows describing the same property (same normalized address, parcel or rounded coordinates)
+# become one row. Each field takes the first non-empty value in site priority order;
+# MERGE_FIELD_PRIORITY overrides the order per field.
+MERGE_PRIORITY = ["Redfin", "Zillow"]
+MERGE_FIELD_PRIORITY: Dict[str, List[str]] = {}
+COORD_DECIMALS = 4  # ~11 m; units in one building are told apart by unit_number
+
+ADDRESS_TOKEN_RE = re.compile(r"[a-z0-9]+|#")
+ADDRESS_ABBREV = {
+    "north": "n", "south": "s", "east": "e", "west": "w",
+    "street": "st", "avenue": "ave", "av": "ave", "drive": "dr", "road": "rd", "lane": "ln",
+    "boulevard": "blvd", "court": "ct", "place": "pl", "circle": "cir", "parkway": "pkwy",
+    "highway": "hwy", "terrace": "ter", "trail": "trl", "way": "wy",
+    "unit": "#", "apt": "#", "ste": "#", "suite": "#",
+}
+MERGED_ROW_FIELDS = ["property_key", "row_type"] + FIELDNAMES
+MERGE_JOINED_FIELDS = ("site", "url", "property_id_site", "images")
+
+def norm_address(addr: str) -> str:
+    """'233 East Erie Drive, Tempe, AZ 85282' and '233 E Erie Dr, Tempe, AZ 85282' -> one key."""
+    tokens = [ADDRESS_ABBREV.get(t, t) for t in ADDRESS_TOKEN_RE.findall(addr.lower())]
+    out: List[str] = []
+    for t in tokens:
+        if t == "#" and out and out[-1] == "#":
+            continue  # "Unit #13"
+        out.append(t)
+    return " ".join(out)
+
+def property_keys(row: Dict[str, Any]) -> List[str]:
+    """Every key that identifies row's property; rows sharing any key are the same property."""
+    keys = []
+    parcel = re.sub(r"\D", "", str(row.get("parcel_number") or ""))
+    if parcel:
+        keys.append(f"apn:{parcel}")
+    addr = norm_address(str(row.get("address") or ""))
+    if addr and any(c.isdigit() for c in addr):
+        keys.append(f"addr:{addr}")
+    lat, lon = norm_num(str(row.get("latitude") or "")), norm_num(str(row.get("longitude") or ""))
+    if lat is not None and lon is not None:
+        unit = str(row.get("unit_number") or "").strip().lower()
+        keys.append(f"geo:{lat:.{COORD_DECIMALS}f},{lon:.{COORD_DECIMALS}f}#{unit}")
+    return keys
+
+class PropertyIndex:
+    """Groups per-site rows into properties (union-find over property_keys) and merges each."""
+
+    def __init__(self, priority: Optional[List[str]] = None,
+                 field_priority: Optional[Dict[str, List[str]]] = None):
+        self.priority = priority or MERGE_PRIORITY
+        self.field_priority = MERGE_FIELD_PRIORITY if field_priority is None else field_priority
+        self.rows: List[Dict[str, Any]] = []
+        self._parent: List[int] = []
+        self._by_key: Dict[str, int] = {}
+        self._ids: Dict[int, set] = {}             # root -> apn:/addr: keys of its group
+        self._geo: Dict[str, List[int]] = {}       # geo key -> rows, joined once all ids are in
+        self._geo_done = True
+
+    def _find(self, i: int) -> int:
+        while self._parent[i] != i:
+            self._parent[i] = self._parent[self._parent[i]]
+            i = self._parent[i]
+        return i
+
+    def _union(self, i: int, j: int) -> None:
+        a, b = self._find(i), self._find(j)
+        if a != b:
+            root, child = min(a, b), max(a, b)  # the earliest row stays the root
+            self._parent[child] = root
+            self._ids[root] = self._ids.get(root, set()) | self._ids.pop(child, set())
+
+    def _conflict(self, i: int, j: int) -> bool:
+        a, b = self._ids.get(self._find(i), set()), self._ids.get(self._find(j), set())
+        for kind in ("apn:", "addr:"):
+            ka = {k for k in a if k.startswith(kind)}
+            kb = {k for k in b if k.startswith(kind)}
+            if ka and kb and not ka & kb:
+                return True
+        return False
+
+    def add(self, row: Dict[str, Any]) -> None:
+        # Each parcel/address key maps to the first row seen with it, and rows sharing one are
+        # unioned, so A~B by address and B~C by parcel still land in one group. Geo keys wait
+        # for _join_geo.
+        i = len(self.rows)
+        self.rows.append(row)
+        self._parent.append(i)
+        for key in property_keys(row):
+            if key.startswith("geo:"):
+                self._geo.setdefault(key, []).append(i)
+                self._geo_done = False
+                continue
+            self._ids.setdefault(self._find(i), set()).add(key)
+            j = self._by_key.setdefault(key, i)
+            if j != i:
+                self._union(i, j)
+
+    def _join_geo(self) -> None:
+        # Rounded coordinates are only a tie-breaker: a geo match joins two groups unless both have
+        # a parcel (or both an address) and those differ, so neighbouring townhouses a few metres
+        # apart stay separate. Runs after every parcel/address union, so a conflict is seen
+        # whichever row came first.
+        for members in self._geo.values():
+            for j in members[1:]:
+                for i in members:
+                    if i != j and not self._conflict(i, j):
+                        self._union(i, j)
+                        break
+        self._geo_done = True
+
+    def groups(self) -> List[List[Dict[str, Any]]]:
+        """Rows per property, properties in first-seen order."""
+        if not self._geo_done:
+            self._join_geo()
+        by_root: Dict[int, List[Dict[str, Any]]] = {}
+        for i, row in enumerate(self.rows):
+            by_root.setdefault(self._find(i), []).append(row)
+        return list(by_root.values())
+
+    def _ranked(self, rows: List[Dict[str, Any]], order: List[str]) -> List[Dict[str, Any]]:
+        rank = {site.lower(): n for n, site in enumerate(order)}
+        return sorted(rows, key=lambda r: rank.get(str(r.get("site", "")).lower(), len(rank)))  # stable
+
+    def merge(self, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        ranked = self._ranked(rows, self.priority)
+        out: Dict[str, Any] = {}
+        for k in FIELDNAMES:
+            if k in MERGE_JOINED_FIELDS:
+                vals: List[str] = []
+                for r in ranked:
+                    for v in str(r.get(k) or "").split("|"):
+                        if v and v not in vals:
+                            vals.append(v)
+                out[k] = "|".join(vals)
+                continue
+            order = self.field_priority.get(k)
+            out[k] = next((r[k] for r in (self._ranked(rows, order) if order else ranked)
+                           if r.get(k) not in (None, "")), "")
+        keys = property_keys(out)
+        out["property_key"] = keys[0] if keys else f"url:{ranked[0].get('url', '')}"
+        return out
+
+    def merged_rows(self, keep_sources: bool = False) -> Iterator[Dict[str, Any]]:
+        """One consolidated row per property; with keep_sources, its per-site rows follow it."""
+        for rows in self.groups():
+            merged = self.merge(rows)
+            merged["row_type"] = "merged"
+            yield merged
+            if keep_sources:
+                for r in rows:
+                    yield dict(r, property_key=merged["property_key"], row_type="source")
+
+def write_properties(src: pathlib.Path, dst: pathlib.Path, keep_sources: bool = False,
+                     priority: Optional[List[str]] = None) -> str:
+    """Merge the per-site rows in src into one row per property in dst; returns a summary."""
+    index = PropertyIndex(priority)
+    with src.open(newline="", encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            index.add(r)
+    n = 0
+    with dst.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=MERGED_ROW_FIELDS)
+        w.writeheader()
+        for r in index.merged_rows(keep_sources):
+            n += r["row_type"] == "merged"
+            w.writerow({k: r.get(k, "") for k in MERGED_ROW_FIELDS})
+    return f"merge: {len(index.rows)} listing rows -> {n} properties"
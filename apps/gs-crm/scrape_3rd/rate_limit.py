@@ -0,0 +1,191 @@
+# rate_limit.py
+# Purpose: per-domain token buckets and the retry policy in front of every listing request, shared
+# by the browser (sync and async) and the HTTP tier.
+
+import time, random, asyncio, threading
+from typing import Dict, Any, Optional, Tuple
+
+from scrape_common import domain_key
+
+try:
+    from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+except ImportError:  # only the browser raises these; the limiter itself doesn't need Playwright
+    PlaywrightTimeoutError = TimeoutError
+
+# A token bucket per domain (requests/s, burst) in front of every navigation. A 429, 5xx or
+# navigation timeout pauses that domain (Retry-After if sent, else exponential backoff from
+# BACKOFF_BASE_S), lowers its ceiling to 80% of the rate that tripped it and halves the rate.
+# Each success wins back a tenth of the ceiling, and every RECOVER_AFTER successes in a row win
+# back a tenth of the configured rate, so a run settles just under what the site tolerates right
+# now. A URL is retried at most MAX_RETRIES times, and a run spends at most RETRY_BUDGET retries
+# per URL on average; past that the listing is skipped (and --resume picks it up later).
+DOMAIN_RATE = {
+    "redfin.com": (0.5, 2),
+    "zillow.com": (0.5, 2),
+}
+DEFAULT_RATE = (2.0, 4)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 3
+RETRY_BUDGET = 0.2
+BACKOFF_BASE_S = 2.0
+BACKOFF_MAX_S = 120.0
+RECOVER_AFTER = 20
+
+class FetchFailed(Exception):
+    """A listing that could not be fetched; build_rows skips it instead of aborting the run."""
+
+class RetryableStatus(FetchFailed):
+    def __init__(self, url: str, status: int, retry_after: Optional[float] = None):
+        super().__init__(f"HTTP {status} for {url}")
+        self.status = status
+        self.retry_after = retry_after
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    # Seconds only; the HTTP-date form falls back to our own backoff.
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
+
+def check_response(url: str, response: Any) -> None:
+    if response is not None and response.status in RETRY_STATUSES:
+        headers = getattr(response, "headers", None) or {}
+        raise RetryableStatus(url, response.status, parse_retry_after(headers.get("retry-after")))
+
+class TokenBucket:
+    """Requests/s for one domain, adapting to throttling (see the config above)."""
+
+    def __init__(self, rate: float, burst: float):
+        self.limit = rate  # as configured
+        self.ceiling = rate
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.stamp = time.monotonic()
+        self.paused_until = 0.0
+        self.failures = 0  # consecutive; drives the exponential backoff
+        self.streak = 0  # consecutive successes since the ceiling last moved
+        self.penalties = 0  # total; waiters re-queue when it changes under them
+
+    def reserve(self) -> float:
+        # Always takes a token and returns how long to wait before using it, so callers queue
+        # up behind each other instead of racing.
+        now = time.monotonic()
+        start = max(now, self.paused_until)  # no tokens accrue while the domain is paused
+        if start > self.stamp:
+            self.tokens = min(self.burst, self.tokens + (start - self.stamp) * self.rate)
+            self.stamp = start
+        self.tokens -= 1
+        return start - now + (-self.tokens / self.rate if self.tokens < 0 else 0.0)
+
+    def penalize(self, retry_after: Optional[float] = None) -> float:
+        """Back the whole domain off after a 429/5xx/timeout; returns the pause in seconds."""
+        now = time.monotonic()
+        if now < self.paused_until:
+            # Requests already in flight when the domain backed off: one burst, one penalty.
+            return self.paused_until - now
+        self.failures += 1
+        self.penalties += 1
+        self.streak = 0
+        if retry_after is None:
+            delay = min(BACKOFF_MAX_S, BACKOFF_BASE_S * 2 ** (self.failures - 1))
+            delay = random.uniform(delay / 2, delay)
+        else:
+            delay = min(BACKOFF_MAX_S, retry_after)
+        self.paused_until = now + delay
+        self.ceiling = max(self.limit / 16, self.rate * 0.8)
+        self.rate = max(self.limit / 16, self.rate / 2)
+        # Outstanding reservations are re-queued by their waiters, so forgive them and restart
+        # from one token at the end of the pause.
+        self.tokens = 1.0
+        self.stamp = self.paused_until
+        return delay
+
+    def reward(self) -> None:
+        self.failures = 0
+        self.streak += 1
+        if self.streak >= RECOVER_AFTER and self.ceiling < self.limit:
+            self.ceiling = min(self.limit, self.ceiling + self.limit / 10)
+            self.streak = 0
+        self.rate = min(self.ceiling, self.rate + self.ceiling / 10)
+
+class RateLimiter:
+    """Token buckets per domain plus the retry policy shared by the sync and async fetch paths."""
+
+    def __init__(self, rates: Optional[Dict[str, Tuple[float, float]]] = None,
+                 max_retries: int = MAX_RETRIES, budget: Optional[int] = None):
+        self.rates = DOMAIN_RATE if rates is None else rates
+        self.max_retries = max_retries
+        self.budget = budget  # retries left for the run; None = only the per-URL cap
+        self.buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()  # --http-first GETs reserve from worker threads
+        self.retries = self.failures = 0
+        self.waited_s = 0.0
+
+    @classmethod
+    def for_urls(cls, n: int, rates: Optional[Dict[str, Tuple[float, float]]] = None,
+                 max_retries: int = MAX_RETRIES) -> "RateLimiter":
+        return cls(rates, max_retries, max(max_retries, int(n * RETRY_BUDGET)))
+
+    def bucket(self, url: str) -> TokenBucket:
+        dom = domain_key(url, self.rates)
+        b = self.buckets.get(dom)
+        if b is None:
+            b = self.buckets.setdefault(dom, TokenBucket(*self.rates.get(dom, DEFAULT_RATE)))
+        return b
+
+    def wait(self, url: str) -> None:
+        b = self.bucket(url)
+        while True:
+            with self._lock:
+                seen = b.penalties
+                d = b.reserve()
+                self.waited_s += d
+            time.sleep(d)
+            if b.penalties == seen:
+                return  # else the domain backed off while we slept: queue again
+
+    async def wait_async(self, url: str) -> None:
+        b = self.bucket(url)
+        while True:
+            with self._lock:  # HTTP-tier threads reserve from the same buckets meanwhile
+                seen = b.penalties
+                d = b.reserve()
+                self.waited_s += d
+            await asyncio.sleep(d)
+            if b.penalties == seen:
+                return
+
+    def succeeded(self, url: str) -> None:
+        with self._lock:
+            self.bucket(url).reward()
+
+    def penalize(self, url: str, retry_after: Optional[float] = None) -> float:
+        """Pause and slow url's domain after a 429/5xx/timeout; returns the pause in seconds."""
+        with self._lock:
+            return self.bucket(url).penalize(retry_after)
+
+    def retry(self, url: str, exc: BaseException, attempt: int) -> bool:
+        """After a failed attempt: True to try url again (once the domain's pause is over),
+        False if exc isn't a throttling/transient error. Raises FetchFailed when out of retries."""
+        if isinstance(exc, RetryableStatus):
+            why, retry_after = f"HTTP {exc.status}", exc.retry_after
+        elif isinstance(exc, PlaywrightTimeoutError):
+            why, retry_after = "timeout", None
+        else:
+            return False
+        pause = self.penalize(url, retry_after)
+        if attempt >= self.max_retries or self.budget == 0:
+            self.failures += 1
+            raise FetchFailed(f"{why} for {url}, giving up after {attempt + 1} attempts") from exc
+        if self.budget is not None:
+            self.budget -= 1
+        self.retries += 1
+        print(f"[~] {why} on {url}; backing off {pause:.1f}s (retry {attempt + 1}/{self.max_retries})")
+        return True
+
+    def summary(self) -> str:
+        rates = ", ".join(f"{d} {b.rate:.2f} req/s (ceiling {b.ceiling:.2f} of {b.limit:.2f})"
+                          for d, b in self.buckets.items())
+        return (f"rate limit: {self.retries} retries, {self.failures} gave up, "
+                f"{self.waited_s:.1f}s queued; {rates or 'no requests'}")
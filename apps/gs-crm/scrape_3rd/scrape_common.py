@@ -0,0 +1,83 @@
+# scrape_common.py
+# Purpose: the row layout and the small URL/number helpers shared by compile_listings.py and the
+# modules it feeds (rate_limit, http_tier, sinks, property_merge), plus the Pipeline handed to
+# every fetch path.
+
+import re, time
+from urllib.parse import urlsplit
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Iterable
+
+FIELDNAMES = [
+    "site","url","address","unit_number","city","state","zip_code","status",
+    "list_price","bedrooms","bathrooms","sqft","lot_size","property_type",
+    "year_built","mls_code","parcel_number","property_id_site",
+    "latitude","longitude","hoa_dues","listing_added_date","listing_updated_date",
+    "last_sale_date","last_sale_price","images"
+]
+
+def norm_num(s: Optional[str]) -> Optional[float]:
+    if not s:
+        return None
+    s2 = s.replace(",", "").strip()
+    try:
+        if s2.endswith("+"):  # e.g., "3+"
+            s2 = s2[:-1]
+        return float(s2)
+    except:
+        # Try to pull the first number in the string
+        m = re.search(r"[-+]?\d*\.?\d+", s2)
+        return float(m.group()) if m else None
+
+def csv_value(v: Any) -> str:
+    # What csv.DictWriter writes for v, so fresh rows compare equal to ones read back.
+    return "" if v is None else str(v)
+
+def ms_since(t0: float) -> float:
+    return round((time.perf_counter() - t0) * 1000, 1)
+
+def site_name(url: str) -> str:
+    return "Redfin" if "redfin.com" in url else ("Zillow" if "zillow.com" in url else "")
+
+def listing_key(url: str) -> str:
+    """Dedup key for a listing URL: redfin:<home id> / zillow:<zpid>, so slug, unit, query and
+    tracking variants of one listing collapse; other URLs key on host + path."""
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    lid = site_listing_id(host, parts.path)
+    if lid:
+        return f"{site_name(host).lower()}:{lid}"
+    return f"{host}{parts.path.rstrip('/')}"
+
+# Site listing ids: property_id_site in extracted rows, and the dedup key for URL input (listing_key).
+REDFIN_HOME_ID_RE = re.compile(r'/home/(\d+)')
+ZILLOW_ZPID_RE = re.compile(r'/(\d+)_zpid\b')
+
+def site_listing_id(domain: str, url: str) -> str:
+    """Redfin home id or Zillow zpid from a listing URL on that domain, else ''."""
+    if "redfin.com" in domain:
+        m = REDFIN_HOME_ID_RE.search(url)
+    elif "zillow.com" in domain:
+        m = ZILLOW_ZPID_RE.search(url)
+    else:
+        m = None
+    return m.group(1) if m else ""
+
+def domain_key(url: str, domains: Iterable[str] = ()) -> str:
+    """The entry of domains that url's host is (or is a subdomain of), else the host itself."""
+    host = (urlsplit(url).hostname or "").lower()
+    for dom in domains:
+        if host == dom or host.endswith("." + dom):
+            return dom
+    return host
+
+@dataclass
+class Pipeline:
+    """Where fetched pages and rows go, shared by every fetch path; all of it is optional."""
+    stats: Optional[List[Dict[str, Any]]] = None                # per-URL fetch stats are appended
+    on_html: Optional[Callable[[str, str], None]] = None        # sees every fetched page
+    on_row: Optional[Callable[[Dict[str, Any]], None]] = None   # rows as they finish; [] returned
+    on_skip: Optional[Callable[[str], None]] = None             # listings that failed
+    sink_room: Optional[Callable[[], Awaitable[None]]] = None   # awaited before a row is handed on
+    limiter: Optional["RateLimiter"] = None
+    extractor: Optional["ExtractStage"] = None                  # extract in its process pool
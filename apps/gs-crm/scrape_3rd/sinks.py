@@ -0,0 +1,563 @@
+# sinks.py
+# Purpose: where scraped rows go. listings.csv with its --resume checkpoint and the run lock, the
+# input-order buffer in front of it, and the optional outputs fed row by row: Parquet, change
+# detection, in-process image downloads and the streamed bundle ZIP.
+
+import os, csv, json, queue, asyncio, hashlib, sqlite3, zipfile, datetime, pathlib, threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple, Callable, NamedTuple
+
+import download_images
+from scrape_common import FIELDNAMES, norm_num, csv_value, listing_key
+
+try:
+    import pyarrow as pa  # optional: only --parquet needs it
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Streamed rows are written in input order, so a listing that is slow (or escalated to the browser
+# behind a long HTTP tier) holds back the finished rows after it. At most ORDER_BUFFER_ROWS wait;
+# past that the oldest gap is given up on, the held rows are written (and checkpointed), and the
+# late listing's row is written whenever it arrives.
+ORDER_BUFFER_ROWS = 32
+
+# In-process image downloads (--download-images): each finished row goes through a queue of at
+# most IMAGE_QUEUE_SIZE listings to download_images.Downloader, so one listing's photos download
+# while the next pages load.
+IMAGE_QUEUE_SIZE = 8
+
+# Columnar output (--parquet): typed FIELDNAMES columns (numbers as numbers, images as a list),
+# one file per run under <root>/scrape_date=YYYY-MM-DD/, so history is appended to, never
+# rewritten, and any Parquet/Arrow reader picks scrape_date up as a partition column.
+# PARQUET_PROGRESS (ignored by Parquet readers: leading underscore) records how many listings.csv
+# rows are already in finished files, so a --resume after a crash only re-adds the rest.
+PARQUET_PROGRESS = "_csv_rows.json"
+PARQUET_BATCH_ROWS = 1000
+FLOAT_FIELDS = {"list_price", "bedrooms", "bathrooms", "sqft", "latitude", "longitude", "last_sale_price"}
+INT_FIELDS = {"year_built"}
+LIST_FIELDS = {"images"}
+
+# --bundle-images: photos (already compressed) go into the ZIP as-is; everything else is deflated.
+STORED_SUFFIXES = {".jpg", ".jpeg", ".webp", ".png", ".gif"}
+
+# Change detection (--changes): the last-known row per listing (site + property_id_site) lives in
+# a SQLite database; only new or changed rows reach the outputs, and every changed field is appended
+# old -> new to the change log (a CSV for this run, the changes table for all runs).
+# CHANGE_IGNORE_FIELDS don't count as a change (the URL slug of one listing varies).
+CHANGE_IGNORE_FIELDS = {"url"}
+CHANGE_SUMMARY_FIELDS = ("list_price", "status", "listing_updated_date")
+
+# ----------------------------
+# CSV OUTPUT (--resume)
+# ----------------------------
+def checkpoint_path(csv_path: pathlib.Path) -> pathlib.Path:
+    return csv_path.with_name(csv_path.name + ".done")
+
+def load_checkpoint(csv_path: pathlib.Path) -> set:
+    """URLs whose rows are already in csv_path, per its checkpoint sidecar."""
+    path = checkpoint_path(csv_path)
+    if not path.exists():
+        return set()
+    with path.open(encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+class RunLock:
+    """Exclusive lock on <csv>.lock for a whole run; the OS drops it if the process dies."""
+
+    def __init__(self, csv_path: pathlib.Path):
+        # Runs share the CSV, its .done checkpoint and the Parquet .part files, so a second run
+        # on the same output exits instead of interleaving with this one.
+        self.path = csv_path.with_name(csv_path.name + ".lock")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = self.path.open("a+b")
+        try:
+            if os.name == "nt":
+                import msvcrt
+                self._f.seek(0)
+                msvcrt.locking(self._f.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._f.close()
+            raise SystemExit(f"Another run is writing {csv_path} (lock {self.path}); wait for it to finish")
+
+    def close(self) -> None:
+        self._f.close()  # closing the file releases the lock
+
+class RowWriter:
+    """Streams rows into a CSV, checkpointing each URL in <csv>.done for --resume."""
+
+    def __init__(self, path: pathlib.Path, resume: bool = False):
+        self.path = path
+        self.checkpoint = checkpoint_path(path)
+        self.written = self.skipped = self.kept = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        done = load_checkpoint(path) if resume else set()
+        if done and path.exists():
+            self.kept = self._keep_checkpointed(done)
+        else:
+            done = set()
+        self.done = done  # URLs already handled (in the CSV, or skip()ped); callers skip these
+        self._f = path.open("a" if done else "w", newline="", encoding="utf-8")
+        self._w = csv.DictWriter(self._f, fieldnames=FIELDNAMES)
+        if not done:
+            self._w.writeheader()
+            self._f.flush()
+        self._done = self.checkpoint.open("a" if done else "w", encoding="utf-8")
+
+    def _keep_checkpointed(self, done: set) -> int:
+        # Stream the old CSV through, keeping the first row of each checkpointed URL; a torn or
+        # unlisted row left at the end by a crash is dropped.
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        seen = set()
+        with self.path.open(newline="", encoding="utf-8") as src, \
+             tmp.open("w", newline="", encoding="utf-8") as dst:
+            w = csv.DictWriter(dst, fieldnames=FIELDNAMES)
+            w.writeheader()
+            for r in csv.DictReader(src):
+                url = r.get("url")
+                if url in done and url not in seen:
+                    seen.add(url)
+                    w.writerow({k: r.get(k) or "" for k in FIELDNAMES})
+        os.replace(tmp, self.path)
+        return len(seen)
+
+    def write(self, row: Dict[str, Any]) -> None:
+        # Row before checkpoint: a crash can leave a row without its URL, never the reverse.
+        self._w.writerow({k: row.get(k, "") for k in FIELDNAMES})
+        self._f.flush()
+        self._done.write(row["url"] + "\n")
+        self._done.flush()
+        self.written += 1
+
+    def skip(self, url: str) -> None:
+        """Checkpoint url without a row (--changes: the listing is unchanged)."""
+        self._done.write(url + "\n")
+        self._done.flush()
+        self.skipped += 1
+
+    def close(self) -> None:
+        self._f.close()
+        self._done.close()
+
+    def __enter__(self) -> "RowWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+class InputOrder:
+    """Hands rows to on_row in input order, holding at most `limit` behind a slow listing."""
+
+    def __init__(self, urls: List[str], on_row: Callable[[Dict[str, Any]], None],
+                 limit: int = ORDER_BUFFER_ROWS):
+        self.on_row = on_row
+        self.limit = max(1, limit)
+        self.index = {u: i for i, u in enumerate(urls)}
+        self.next = 0
+        self.held: Dict[int, Optional[Dict[str, Any]]] = {}
+        self.late: set = set()       # given up on; written out of order when they arrive
+        self.peak = 0
+        self.out_of_order = 0
+
+    # Every URL must end in row() or skip(); they may come in any order (cache hits, HTTP tier,
+    # concurrent pages, extractor processes).
+    def row(self, row: Dict[str, Any]) -> None:
+        self._settle(self.index[row["url"]], row)
+
+    def skip(self, url: str) -> None:
+        self._settle(self.index[url], None)
+
+    def _settle(self, i: int, row: Optional[Dict[str, Any]]) -> None:
+        if i in self.late:
+            self.late.discard(i)
+            if row is not None:
+                self.out_of_order += 1
+                self.on_row(row)
+            return
+        self.held[i] = row
+        while self.held:
+            if self.next not in self.held:
+                if len(self.held) <= self.limit:
+                    break
+                # Full: stop waiting for the gap(s) before the oldest held row.
+                first = min(self.held)
+                self.late.update(range(self.next, first))
+                self.next = first
+            ready = self.held.pop(self.next)
+            self.next += 1
+            if ready is not None:
+                self.on_row(ready)
+        self.peak = max(self.peak, len(self.held))
+
+    def summary(self) -> str:
+        return (f"input order: buffer peak {self.peak}/{self.limit} rows, "
+                f"{self.out_of_order} rows written out of order")
+
+# ----------------------------
+# COLUMNAR OUTPUT (--parquet)
+# ----------------------------
+def parquet_schema() -> "pa.Schema":
+    def kind(name: str) -> "pa.DataType":
+        if name in FLOAT_FIELDS:
+            return pa.float64()
+        if name in INT_FIELDS:
+            return pa.int32()
+        if name in LIST_FIELDS:
+            return pa.list_(pa.string())
+        return pa.string()
+    return pa.schema([pa.field(name, kind(name), nullable=True) for name in FIELDNAMES])
+
+def typed_value(name: str, v: Any) -> Any:
+    """A row value (fresh from row_from_html, or a string read back from listings.csv) as the
+    Parquet column type; blanks become nulls."""
+    if v is None or v == "":
+        return [] if name in LIST_FIELDS else None
+    if name in FLOAT_FIELDS:
+        return float(v) if not isinstance(v, str) else norm_num(v)
+    if name in INT_FIELDS:
+        n = v if not isinstance(v, str) else norm_num(v)
+        return int(n) if n is not None else None
+    if name in LIST_FIELDS:
+        return [u for u in v.split("|") if u] if isinstance(v, str) else list(v)
+    return str(v)
+
+class ParquetSink:
+    """Streams rows into this run's <name>.parquet.part, renamed into place by close()."""
+
+    def __init__(self, root: pathlib.Path, resume: bool = False,
+                 scrape_date: Optional[datetime.date] = None):
+        # Runs hold the RunLock, so a .part found here was left by an interrupted run and its rows
+        # never reached Parquet. With resume=True the caller re-feeds the listings.csv rows past
+        # .csv_rows, the count the last finished file covered (see .recovering).
+        stale = sorted(root.glob("scrape_date=*/*.parquet.part")) if root.exists() else []
+        self.recovering = resume and bool(stale)
+        for f in stale:
+            f.unlink()
+        self.progress = root / PARQUET_PROGRESS
+        # Rows of listings.csv already in finished Parquet files; a fresh run starts a fresh CSV.
+        self.csv_rows = self._load_progress() if resume else 0
+        if not resume:
+            self._save_progress(0)
+        day = scrape_date or datetime.date.today()
+        stamp = datetime.datetime.now().strftime("%H%M%S")
+        part = root / f"scrape_date={day.isoformat()}"
+        self.path = part / f"part-{stamp}-{os.getpid()}.parquet"
+        n = 1
+        while self.path.exists():  # a second file from this process within the same second
+            self.path = part / f"part-{stamp}-{os.getpid()}-{n}.parquet"
+            n += 1
+        self.tmp = self.path.with_name(self.path.name + ".part")
+        self.tmp.parent.mkdir(parents=True, exist_ok=True)
+        self.schema = parquet_schema()
+        self._writer = pq.ParquetWriter(self.tmp, self.schema, compression="zstd")
+        self._batch: List[Dict[str, Any]] = []
+        self.rows = 0
+
+    def write(self, row: Dict[str, Any]) -> None:
+        self._batch.append({k: typed_value(k, row.get(k)) for k in FIELDNAMES})
+        if len(self._batch) >= PARQUET_BATCH_ROWS:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._batch:
+            self._writer.write_table(pa.Table.from_pylist(self._batch, schema=self.schema))
+            self.rows += len(self._batch)
+            self._batch = []
+
+    def close(self, csv_rows: int) -> None:
+        """Finish the file; csv_rows: listings.csv's row count, all of them now in Parquet."""
+        self._flush()
+        self._writer.close()
+        if self.rows:
+            os.replace(self.tmp, self.path)
+        else:
+            self.tmp.unlink()
+        self._save_progress(csv_rows)
+
+    def _load_progress(self) -> int:
+        try:
+            return int(json.loads(self.progress.read_text(encoding="utf-8"))["csv_rows"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return 0  # unknown: re-add every CSV row rather than lose any
+
+    def _save_progress(self, csv_rows: int) -> None:
+        self.progress.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.progress.with_name(self.progress.name + ".tmp")
+        tmp.write_text(json.dumps({"csv_rows": csv_rows}), encoding="utf-8")
+        os.replace(tmp, self.progress)
+
+    def summary(self) -> str:
+        where = self.path if self.rows else "nothing written"
+        return f"parquet: {self.rows} rows -> {where}"
+
+def open_parquet(root: pathlib.Path, resume: bool = False) -> Optional[ParquetSink]:
+    if pa is None:
+        print("[!] --parquet needs pyarrow (pip install pyarrow); skipping columnar output")
+        return None
+    return ParquetSink(root, resume=resume)
+
+# ----------------------------
+# CHANGE DETECTION (--changes)
+# ----------------------------
+CHANGES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    key TEXT PRIMARY KEY, hash TEXT NOT NULL, row TEXT NOT NULL,
+    first_seen TEXT NOT NULL, last_seen TEXT NOT NULL, last_changed TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS changes (
+    seen_at TEXT NOT NULL, key TEXT NOT NULL, url TEXT, kind TEXT NOT NULL,
+    field TEXT, old TEXT, new TEXT);
+CREATE INDEX IF NOT EXISTS changes_key ON changes (key, seen_at);
+"""
+CHANGE_LOG_FIELDS = ["seen_at", "key", "url", "kind", "field", "old", "new"]
+
+def now_iso() -> str:
+    return datetime.datetime.now().isoformat(timespec="seconds")
+
+def change_key(row: Dict[str, Any]) -> str:
+    """redfin:<home id> / zillow:<zpid> from the row's site and property_id_site, else listing_key(url)."""
+    site, pid = csv_value(row.get("site")), csv_value(row.get("property_id_site"))
+    return f"{site.lower()}:{pid}" if site and pid else listing_key(csv_value(row.get("url")))
+
+def row_digest(values: Dict[str, str]) -> str:
+    kept = [values[k] for k in FIELDNAMES if k not in CHANGE_IGNORE_FIELDS]
+    return hashlib.sha256(json.dumps(kept).encode("utf-8")).hexdigest()
+
+class Change(NamedTuple):
+    key: str
+    values: Dict[str, str]               # the row as csv_value strings
+    digest: str
+    fields: List[Tuple[str, str, str]]   # (field, old, new); empty for a new listing
+    new: bool
+
+class ChangeStore:
+    """Last-known normalized row per listing in SQLite, plus the log of what changed."""
+
+    def __init__(self, path: pathlib.Path, log_path: pathlib.Path, resume: bool = False):
+        self.path = path
+        self.log_path = log_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(path))
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(CHANGES_SCHEMA)
+        append = resume and log_path.exists()
+        self._log_f = log_path.open("a" if append else "w", newline="", encoding="utf-8")
+        self._log = csv.DictWriter(self._log_f, fieldnames=CHANGE_LOG_FIELDS)
+        if not append:
+            self._log.writeheader()
+        self.new = self.changed = self.unchanged = 0
+        self.field_counts: Dict[str, int] = {}
+
+    def observe(self, row: Dict[str, Any]) -> Optional[Change]:
+        """A Change if the listing is new or any field differs, else None. Callers write the row
+        out before record(): a crash in between re-reports the change instead of losing it."""
+        key = change_key(row)
+        values = {k: csv_value(row.get(k)) for k in FIELDNAMES}
+        digest = row_digest(values)
+        got = self.db.execute("SELECT hash, row FROM listings WHERE key = ?", (key,)).fetchone()
+        if got is None:
+            return Change(key, values, digest, [], True)
+        if got[0] == digest:
+            with self.db:
+                self.db.execute("UPDATE listings SET last_seen = ? WHERE key = ?", (now_iso(), key))
+            self.unchanged += 1
+            return None
+        old = json.loads(got[1])
+        fields = [(k, old.get(k, ""), values[k]) for k in FIELDNAMES
+                  if k not in CHANGE_IGNORE_FIELDS and old.get(k, "") != values[k]]
+        return Change(key, values, digest, fields, False)
+
+    def record(self, change: Change) -> None:
+        """Store the row and log each changed field old -> new."""
+        now = now_iso()
+        url = change.values["url"]
+        if change.new:
+            logged = [{"seen_at": now, "key": change.key, "url": url, "kind": "new"}]
+        else:
+            logged = [{"seen_at": now, "key": change.key, "url": url, "kind": "changed",
+                       "field": f, "old": old, "new": new} for f, old, new in change.fields]
+        with self.db:
+            self.db.execute(
+                "INSERT INTO listings (key, hash, row, first_seen, last_seen, last_changed) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET hash = excluded.hash, row = excluded.row, "
+                "last_seen = excluded.last_seen, last_changed = excluded.last_changed",
+                (change.key, change.digest, json.dumps(change.values), now, now, now))
+            self.db.executemany(
+                "INSERT INTO changes (seen_at, key, url, kind, field, old, new) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [tuple(e.get(k) for k in CHANGE_LOG_FIELDS) for e in logged])
+        self._log.writerows(logged)
+        self._log_f.flush()
+        if change.new:
+            self.new += 1
+            return
+        self.changed += 1
+        for f, old, new in change.fields:
+            self.field_counts[f] = self.field_counts.get(f, 0) + 1
+            if f in CHANGE_SUMMARY_FIELDS:
+                print(f"[~] {change.key} {f}: {old or '-'} -> {new or '-'}")
+
+    def close(self) -> None:
+        self._log_f.close()
+        self.db.close()
+
+    def __enter__(self) -> "ChangeStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def summary(self) -> str:
+        fields = ", ".join(f"{f} {n}" for f, n in sorted(self.field_counts.items(), key=lambda kv: -kv[1]))
+        return (f"changes: {self.new} new, {self.changed} changed, {self.unchanged} unchanged"
+                + (f" ({fields})" if fields else "") + f"; log {self.log_path}, state {self.path}")
+
+# ----------------------------
+# IMAGES (--download-images, --bundle-images)
+# ----------------------------
+class ImageStage:
+    """Downloads listing photos into images_dir while scraping continues."""
+
+    def __init__(self, images_dir: pathlib.Path, start: int = 0, workers: int = download_images.WORKERS,
+                 thumb_size: int = 0, queue_size: int = IMAGE_QUEUE_SIZE,
+                 on_file: Optional[Callable[[pathlib.Path], None]] = None):
+        # Folders are numbered by the row's position in listings.csv (start = rows already there),
+        # so the bundled download_images.py finds every file in place afterwards.
+        self.images_dir = images_dir
+        self.index = start
+        self.queue: "queue.Queue[Optional[Tuple[int, Dict[str, Any]]]]" = queue.Queue(maxsize=queue_size)
+        self.downloader = download_images.Downloader(images_dir, workers=workers, thumb_size=thumb_size,
+                                                     on_file=on_file)
+        self.thread = threading.Thread(target=self._feed, name="image-stage", daemon=True)
+        self.thread.start()
+        self._putter = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-put")
+        self._waiting: List["asyncio.Future"] = []
+
+    def put(self, row: Dict[str, Any]) -> None:
+        """Queue row's photos. A full queue blocks the sequential fetcher; inside the async engine
+        the waiting put runs on a helper thread and fetchers await room_async() instead."""
+        self.index += 1
+        if not row.get("images"):
+            return
+        # As listings.csv holds it (None -> ""), so folder names match download_images.py's.
+        item = (self.index, {k: csv_value(v) for k, v in row.items()})
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.queue.put(item)  # blocks while full: page fetching waits for the downloads
+            return
+        self._waiting = [f for f in self._waiting if not f.done()]
+        if not self._waiting:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                pass
+        self._waiting.append(loop.run_in_executor(self._putter, self.queue.put, item))
+
+    async def room_async(self) -> None:
+        """Wait, without blocking the event loop, until every row put() so far is queued."""
+        while self._waiting:
+            await self._waiting.pop(0)
+
+    def _feed(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            idx, row = item
+            try:
+                self.downloader.add(download_images.listing_jobs(idx, row, self.images_dir))
+            except Exception as e:
+                print(f"[!] Image downloads for {row.get('url')} failed: {e}")
+
+    def close(self) -> Dict[str, int]:
+        self._putter.shutdown(wait=True)
+        self.queue.put(None)
+        self.thread.join()
+        return self.downloader.close()
+
+def zip_bundle(zip_path: pathlib.Path, files: List[pathlib.Path]) -> None:
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as z:
+        for f in files:
+            z.write(f, arcname=f.name)
+
+class ZipStreamer:
+    """The --bundle-images ZIP, filled by a writer thread while the run is still going."""
+
+    def __init__(self, zip_path: pathlib.Path, images_dir: pathlib.Path):
+        self.zip_path = zip_path
+        self.images_dir = images_dir
+        self.tmp = zip_path.with_name(zip_path.name + ".part")
+        zip_path.parent.mkdir(parents=True, exist_ok=True)
+        self._zip = zipfile.ZipFile(self.tmp, "w", zipfile.ZIP_DEFLATED)
+        self._queue: "queue.SimpleQueue[Optional[pathlib.Path]]" = queue.SimpleQueue()
+        self._names: set = set()
+        self.stored = self.deflated = 0
+        self._thread = threading.Thread(target=self._drain, name="zip-writer", daemon=True)
+        self._thread.start()
+
+    def add(self, path: pathlib.Path) -> None:
+        """Queue a file under images_dir; safe to call from any thread."""
+        self._queue.put(pathlib.Path(path))
+
+    def _write(self, path: pathlib.Path, arcname: str) -> None:
+        if arcname in self._names:
+            return
+        self._names.add(arcname)
+        if path.suffix.lower() in STORED_SUFFIXES:
+            self._zip.write(path, arcname, compress_type=zipfile.ZIP_STORED)
+            self.stored += 1
+        else:
+            self._zip.write(path, arcname, compress_type=zipfile.ZIP_DEFLATED)
+            self.deflated += 1
+
+    def _image_arcname(self, path: pathlib.Path) -> str:
+        return path.relative_to(self.images_dir.parent).as_posix()
+
+    def _drain(self) -> None:
+        while True:
+            path = self._queue.get()
+            if path is None:
+                return
+            try:
+                self._write(path, self._image_arcname(path))
+            except (OSError, ValueError) as e:
+                print(f"[!] Could not add {path} to {self.zip_path.name}: {e}")
+
+    def listing_dirs(self, csv_path: pathlib.Path) -> List[pathlib.Path]:
+        """The image folder of every row in csv_path, as download_images.py lays them out."""
+        dirs = []
+        with csv_path.open(newline="", encoding="utf-8") as f:
+            for idx, row in enumerate(csv.DictReader(f), start=1):
+                jobs = download_images.listing_jobs(idx, row, self.images_dir)
+                if jobs:
+                    dirs.append(jobs[0][2].parent)
+        return dirs
+
+    def close(self, files: List[pathlib.Path], csv_path: pathlib.Path) -> None:
+        """Finish the archive: whatever else is in the image folders of csv_path's rows (photos
+        from earlier runs, manifests, thumbnails), then files at the top level. Folders of rows
+        no longer in the CSV stay out."""
+        self._queue.put(None)
+        self._thread.join()
+        for folder in self.listing_dirs(csv_path):
+            for f in sorted(folder.rglob("*")) if folder.is_dir() else []:
+                if f.is_file() and not f.name.endswith(".part"):
+                    self._write(f, self._image_arcname(f))
+        for f in files:
+            self._write(f, f.name)
+        self._zip.close()
+        os.replace(self.tmp, self.zip_path)
+
+    def abort(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+        self._zip.close()
+        self.tmp.unlink(missing_ok=True)
+
+    def summary(self) -> str:
+        return (f"bundle: {self.stored} files stored, {self.deflated} deflated, "
+                f"{self.zip_path.stat().st_size / 1e6:.1f} MB in {self.zip_path}")
@@ -0,0 +1,159 @@
+# snapshot_cache.py
+# Purpose: on-disk cache of rendered listing HTML so re-runs only launch the browser for stale or
+# missing URLs, and extraction can be re-run from cached pages without touching the network.
+#
+# Layout:
+#   <root>/index.json                 url -> {"sha", "size", "fetched", "accessed"}
+#   <root>/objects/ab/abcdef....gz    gzip'd HTML, named by the sha256 of the HTML itself
+#
+# Blobs are content-addressed, so a page that renders identically under two URLs (or across
+# re-fetches) is stored once. Entries older than the TTL are stale; once the blobs exceed
+# max_bytes the least recently used URLs are dropped until the store is back under EVICT_TO of it.
+
+import os, gzip, time, hashlib, pathlib, tempfile, threading
+from typing import Dict, Any, Optional, Tuple, Iterator
+
+from download_images import JsonIndex
+
+DEFAULT_TTL_S = 24 * 3600
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024
+EVICT_TO = 0.9  # eviction frees down to this share of max_bytes, so it runs once per batch
+FLUSH_EVERY = 25  # index writes are batched (see JsonIndex); close() always flushes
+
+class SnapshotCache:
+    """Thread-safe: the async engine stores pages from a helper thread (see put())."""
+
+    def __init__(self, root: pathlib.Path, ttl_s: float = DEFAULT_TTL_S,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = pathlib.Path(root)
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self.objects = self.root / "objects"
+        self.index_path = self.root / "index.json"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._index = JsonIndex(self.index_path, FLUSH_EVERY)
+        self.index: Dict[str, Dict[str, Any]] = self._index.data
+        # Running totals, so put() never re-sums the index: blob size counted once per sha.
+        self._refs: Dict[str, int] = {}
+        self._bytes = 0
+        for e in self.index.values():
+            self._ref(e)
+        self.hits = self.misses = self.stale = 0
+        self.evict()  # max_bytes may have shrunk since the last run
+
+    def __enter__(self) -> "SnapshotCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _blob(self, sha: str) -> pathlib.Path:
+        return self.objects / sha[:2] / f"{sha}.gz"
+
+    def _ref(self, entry: Dict[str, Any]) -> None:
+        n = self._refs.get(entry["sha"], 0)
+        self._refs[entry["sha"]] = n + 1
+        if not n:
+            self._bytes += entry["size"]
+
+    def _unref(self, entry: Dict[str, Any]) -> bool:
+        """Drop one reference to entry's blob; True once nothing points at it any more."""
+        n = self._refs.pop(entry["sha"]) - 1
+        if n:
+            self._refs[entry["sha"]] = n
+            return False
+        self._bytes -= entry["size"]
+        return True
+
+    def _read(self, url: str) -> Optional[Tuple[str, float]]:
+        entry = self.index.get(url)
+        if entry is None:
+            return None
+        try:
+            html = gzip.decompress(self._blob(entry["sha"]).read_bytes()).decode("utf-8")
+        except (OSError, EOFError):
+            # Blob vanished or is truncated: forget the entry rather than serve garbage.
+            self._unref(self.index.pop(url))
+            self._index.changed()
+            return None
+        entry["accessed"] = time.time()
+        self._index.changed()
+        return html, time.time() - entry["fetched"]
+
+    def blob_path(self, url: str) -> Optional[pathlib.Path]:
+        """Where url's gzip'd HTML lives, for readers in other processes."""
+        entry = self.index.get(url)
+        return self._blob(entry["sha"]) if entry is not None else None
+
+    def get(self, url: str) -> Optional[str]:
+        """Cached HTML if fresh (younger than the TTL), else None."""
+        with self._lock:
+            got = self._read(url) if self.is_fresh(url) else None
+            if got is None:
+                if url in self.index:
+                    self.stale += 1
+                else:
+                    self.misses += 1
+                return None
+            self.hits += 1
+            return got[0]
+
+    def is_fresh(self, url: str) -> bool:
+        entry = self.index.get(url)
+        return entry is not None and time.time() - entry["fetched"] < self.ttl_s
+
+    def put(self, url: str, html: str) -> None:
+        """Store url's HTML. Compresses and writes to disk: async callers run it off the event loop."""
+        data = html.encode("utf-8")
+        sha = hashlib.sha256(data).hexdigest()
+        blob = self._blob(sha)
+        with self._lock:
+            if not blob.exists():
+                blob.parent.mkdir(parents=True, exist_ok=True)
+                fd, tmp = tempfile.mkstemp(dir=blob.parent, suffix=".tmp")
+                with os.fdopen(fd, "wb") as f:
+                    f.write(gzip.compress(data, compresslevel=6))
+                os.replace(tmp, blob)
+            now = time.time()
+            old = self.index.get(url)
+            if old is not None:
+                self._unref(old)  # same sha: re-counted just below
+            entry = self.index[url] = {"sha": sha, "size": blob.stat().st_size, "fetched": now, "accessed": now}
+            self._ref(entry)
+            if old is not None and old["sha"] != sha and old["sha"] not in self._refs:
+                self._blob(old["sha"]).unlink(missing_ok=True)
+            self.evict()
+            self._index.changed()
+
+    def urls(self) -> Iterator[str]:
+        return iter(list(self.index))
+
+    def total_bytes(self) -> int:
+        return self._bytes
+
+    def evict(self) -> None:
+        """Once the blobs exceed max_bytes, drop least recently used URLs until they fit in
+        EVICT_TO of it."""
+        with self._lock:
+            if self._bytes <= self.max_bytes:
+                return
+            target = self.max_bytes * EVICT_TO
+            for url, e in sorted(self.index.items(), key=lambda kv: kv[1]["accessed"]):
+                if self._bytes <= target:
+                    break
+                del self.index[url]
+                if self._unref(e):
+                    self._blob(e["sha"]).unlink(missing_ok=True)
+            self._index.changed()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._index.flush()
+
+    def close(self) -> None:
+        self.flush()
+
+    def summary(self) -> str:
+        return (f"snapshot cache: {self.hits} fresh, {self.stale} stale, {self.misses} missing; "
+                f"{len(self.index)} URLs, {self.total_bytes() / 1e6:.1f} MB in {self.root}")